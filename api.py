@@ -3,15 +3,16 @@ AutomationX TTS - API (FastAPI) with Background Job System
 """
 
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form, BackgroundTasks
-from fastapi.responses import StreamingResponse, FileResponse, JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, FileResponse, JSONResponse
 from pydantic import BaseModel, Field
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Tuple
 import io
 import os
-import torch
-import torchaudio as ta
-import random
+import secrets
 import uuid
+import heapq
+import queue
 import threading
 import time
 from datetime import datetime
@@ -21,13 +22,16 @@ from core import (
     get_state,
     logger,
     normalize_text,
-    AudioProcessor,
     LANGUAGES,
     PRESETS,
+    PRESET_VALUES,
+    resolve_preset,
     split_into_sentences,
     merge_audio_with_crossfade,
+    write_wav,
+    generate_chunks,
 )
-from core.cache import model_cache
+from core.cache import model_cache, content_hasher
 
 state = get_state()
 
@@ -53,31 +57,81 @@ class Job:
         self.completed_at: Optional[datetime] = None
 
 # In-memory job store (Colab için yeterli)
-jobs: Dict[str, Job] = {}
-job_lock = threading.Lock()
+# Tek kilit yerine 16 parçaya bölünür; her parçanın kendi kilidi var
+class _JobShard:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.map: Dict[str, Job] = {}
+
+JOB_SHARD_COUNT = 16  # 2'nin kuvveti olmalı
+_shards = [_JobShard() for _ in range(JOB_SHARD_COUNT)]
+
+def _shard(job_id: str) -> _JobShard:
+    return _shards[hash(job_id) & (JOB_SHARD_COUNT - 1)]
+
+JOB_TTL_SECONDS = 3600  # 1 saat
+
+# (son geçerlilik zamanı, job_id) min-heap'i - cleanup sadece süresi dolanları gezer
+_expiry_heap: List[Tuple[float, str]] = []
+_expiry_lock = threading.Lock()
+
+# Durum sayaçları - /health tüm job'ları taramasın
+# Kilit sırası: _status_lock -> shard.lock
+status_counts: Dict[JobStatus, int] = {status: 0 for status in JobStatus}
+_status_lock = threading.Lock()
+
+def get_job(job_id: str) -> Optional[Job]:
+    """Job'u bul, yoksa None"""
+    shard = _shard(job_id)
+    with shard.lock:
+        return shard.map.get(job_id)
+
+def add_job(job: Job):
+    """Job'u kaydet"""
+    shard = _shard(job.id)
+    with _status_lock:
+        with shard.lock:
+            shard.map[job.id] = job
+        status_counts[job.status] += 1
+    with _expiry_lock:
+        heapq.heappush(_expiry_heap, (time.time() + JOB_TTL_SECONDS, job.id))
+
+def set_job_status(job: Job, status: JobStatus):
+    """Job durumunu değiştir ve sayaçları güncelle"""
+    with _status_lock:
+        if _shard(job.id).map.get(job.id) is job:
+            status_counts[job.status] -= 1
+            status_counts[status] += 1
+        job.status = status
 
 def cleanup_old_jobs():
     """1 saatten eski job'ları temizle"""
-    with job_lock:
-        now = datetime.now()
-        to_delete = []
-        for job_id, job in jobs.items():
-            age = (now - job.created_at).total_seconds()
-            if age > 3600:  # 1 saat
-                to_delete.append(job_id)
-                # Dosyayı da sil
-                if job.result_path and os.path.exists(job.result_path):
-                    try:
-                        os.remove(job.result_path)
-                    except:
-                        pass
-        for job_id in to_delete:
-            del jobs[job_id]
+    now = time.time()
+    expired = []
+    with _expiry_lock:
+        while _expiry_heap and _expiry_heap[0][0] <= now:
+            expired.append(heapq.heappop(_expiry_heap)[1])
+    
+    for job_id in expired:
+        shard = _shard(job_id)
+        with _status_lock:
+            with shard.lock:
+                job = shard.map.pop(job_id, None)
+            if job is None:
+                continue
+            status_counts[job.status] -= 1
+        
+        # Dosyayı da sil
+        if job.result_path and os.path.exists(job.result_path):
+            try:
+                os.remove(job.result_path)
+            except:
+                pass
 
 def process_tts_job(job: Job):
     """Arka planda TTS işlemi"""
     try:
-        job.status = JobStatus.PROCESSING
+        set_job_status(job, JobStatus.PROCESSING)
         params = job.params
         
         text = params["text"].strip()
@@ -87,14 +141,12 @@ def process_tts_job(job: Job):
         cfg_weight = params.get("cfg_weight", 0.5)
         seed = params.get("seed", -1)
         ref_audio_path = params.get("ref_audio_path")
+        ref_hash = params.get("ref_hash")
         
         # Preset uygula
-        if preset and preset in PRESETS:
-            exaggeration = PRESETS[preset]["exaggeration"]
-            cfg_weight = PRESETS[preset]["cfg_weight"]
+        exaggeration, cfg_weight = resolve_preset(preset, exaggeration, cfg_weight)
         
-        actual_seed = seed if seed >= 0 else random.randint(0, 999999)
-        torch.manual_seed(actual_seed)
+        actual_seed = seed if seed >= 0 else secrets.randbits(31)
         
         tts = state.tts_model
         lang_code = language if language in LANGUAGES else "tr"
@@ -106,57 +158,43 @@ def process_tts_job(job: Job):
         total_chunks = len(chunks)
         logger.info(f"[Job {job.id}] Processing {total_chunks} chunks...")
         
-        audio_segments = []
+        def on_progress(i, total):
+            job.progress = (i / total) * 0.8  # 0-80%
         
-        for i, chunk in enumerate(chunks):
-            job.progress = (i / total_chunks) * 0.8  # 0-80%
-            chunk_seed = actual_seed + i
-            
-            wav_chunk = None
-            for attempt in range(3):
-                try:
-                    current_seed = chunk_seed + (attempt * 100)
-                    torch.manual_seed(current_seed)
-                    if torch.cuda.is_available():
-                        torch.cuda.manual_seed(current_seed)
-                    
-                    wav_chunk = tts.generate(
-                        chunk,
-                        language_id=lang_code,
-                        audio_prompt_path=ref_audio_path,
-                        exaggeration=exaggeration,
-                        cfg_weight=cfg_weight
-                    )
-                    break
-                except RuntimeError as e:
-                    logger.warning(f"[Job {job.id}] Chunk failed (attempt {attempt+1}): {e}")
-                    if attempt == 2:
-                        wav_chunk = torch.zeros(1, int(tts.sr * 0.5))
-            
-            if wav_chunk is not None:
-                audio_segments.append(wav_chunk)
+        audio_segments = generate_chunks(
+            tts,
+            chunks,
+            language_id=lang_code,
+            audio_prompt_path=ref_audio_path,
+            ref_hash=ref_hash,
+            exaggeration=exaggeration,
+            cfg_weight=cfg_weight,
+            seed=actual_seed,
+            cache_results=seed >= 0,
+            progress_callback=on_progress,
+            log_prefix=f"[Job {job.id}] ",
+            autocast_dtype=state.autocast_dtype,
+        )
         
         job.progress = 0.85
         
         if len(audio_segments) > 1:
-            wav = merge_audio_with_crossfade(audio_segments, tts.sr)
+            wav = merge_audio_with_crossfade(audio_segments, tts.sr, release=True)
         else:
             wav = audio_segments[0]
         
         job.progress = 0.9
         
-        audio_processor = AudioProcessor(state.audio_config)
-        wav = audio_processor.process(wav, tts.sr)
+        wav = state.audio_processor.process(wav, tts.sr)
         
         # Kaydet
-        os.makedirs(state.outputs_dir, exist_ok=True)
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"job_{job.id}_{timestamp}.wav"
         filepath = os.path.join(state.outputs_dir, filename)
-        ta.save(filepath, wav, tts.sr)
+        write_wav(filepath, wav, tts.sr)
         
         job.result_path = filepath
-        job.status = JobStatus.COMPLETED
+        set_job_status(job, JobStatus.COMPLETED)
         job.progress = 1.0
         job.completed_at = datetime.now()
         
@@ -169,13 +207,49 @@ def process_tts_job(job: Job):
             except:
                 pass
         
-        # Eski job'ları temizle
-        cleanup_old_jobs()
-        
     except Exception as e:
         logger.error(f"[Job {job.id}] Failed: {e}")
-        job.status = JobStatus.FAILED
         job.error = str(e)
+        set_job_status(job, JobStatus.FAILED)
+
+
+# Async job'lar tek worker thread'inde kuyruktan sırayla işlenir. Senkron /generate
+# ve UI da aynı modeli kullanır; model erişimi generate_chunks içindeki kilitle seri yapılır.
+job_queue: "queue.Queue[Job]" = queue.Queue()
+CLEANUP_EVERY_N_JOBS = 10
+
+def _worker_loop():
+    """Kuyruktaki job'ları sırayla işle, N job'da bir eski job'ları temizle"""
+    processed = 0
+    while True:
+        job = job_queue.get()
+        try:
+            process_tts_job(job)
+        finally:
+            job_queue.task_done()
+        
+        processed += 1
+        if processed % CLEANUP_EVERY_N_JOBS == 0:
+            cleanup_old_jobs()
+
+
+def _validate_preset(preset: Optional[str]):
+    """Bilinmeyen preset'i GPU işi başlamadan reddet"""
+    if preset and preset not in PRESET_VALUES:
+        raise HTTPException(status_code=400, detail=f"Bilinmeyen preset: {preset}")
+
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
+UPLOADS_DIR = os.path.join(state.base_dir, "temp_uploads")
+
+def _save_upload(upload: UploadFile, path: str) -> str:
+    """Upload'ı parça parça diske yaz, içerik hash'ini döndür"""
+    hasher = content_hasher()
+    with open(path, "wb") as f:
+        for block in iter(lambda: upload.file.read(UPLOAD_CHUNK_SIZE), b""):
+            hasher.update(block)
+            f.write(block)
+    return hasher.hexdigest()
 
 
 # ===================================================================
@@ -227,6 +301,21 @@ Referans ses dosyası yükleyerek kendi sesinizi klonlayabilirsiniz.
     openapi_tags=tags_metadata,
 )
 
+@api_app.on_event("startup")
+def _prep_dirs():
+    """Upload klasörünü bir kez oluştur (outputs, AppState açılışında oluşur)"""
+    os.makedirs(UPLOADS_DIR, exist_ok=True)
+
+@api_app.on_event("startup")
+def _start_worker():
+    """Job worker thread'ini başlat"""
+    threading.Thread(target=_worker_loop, name="tts-worker", daemon=True).start()
+
+@api_app.on_event("startup")
+def _preload_model():
+    """Model yüklemesini sunucu açılırken arka planda başlat"""
+    state.preload()
+
 @api_app.post("/unload", tags=["⚙️ Sistem"], summary="Modeli Boşalt")
 async def api_unload():
     """
@@ -241,13 +330,14 @@ async def api_unload():
 async def api_health():
     """Sistem sağlık durumu"""
     is_loaded = model_cache.has("tts")
-    pending_jobs = sum(1 for j in jobs.values() if j.status == JobStatus.PENDING)
-    processing_jobs = sum(1 for j in jobs.values() if j.status == JobStatus.PROCESSING)
+    pending_jobs = status_counts[JobStatus.PENDING]
+    processing_jobs = status_counts[JobStatus.PROCESSING]
     
     return {
         "status": "ok",
         "device": state.device,
         "model_loaded": is_loaded,
+        "model_cache": model_cache.get_status(),
         "pending_jobs": pending_jobs,
         "processing_jobs": processing_jobs,
     }
@@ -269,7 +359,6 @@ async def api_presets():
 
 @api_app.post("/generate/async", tags=["🎤 Ses Üretimi"], summary="Async Ses Üret (Önerilen)")
 async def api_generate_async(
-    background_tasks: BackgroundTasks,
     text: str = Form(..., description="Sese dönüştürülecek metin (max 50.000 karakter)"),
     language: str = Form("tr", description="Dil kodu (tr, en, de, fr, ...)"),
     preset: Optional[str] = Form(None, description="Ses şablonu (default, news_anchor, storyteller...)"),
@@ -286,19 +375,17 @@ async def api_generate_async(
     text = text.strip()
     if not text:
         raise HTTPException(status_code=400, detail="Metin boş olamaz")
+    _validate_preset(preset)
     
     # Job oluştur
     job_id = str(uuid.uuid4())[:8]
     
     # Ref audio varsa kaydet
     ref_audio_path = None
+    ref_hash = None
     if ref_audio:
-        temp_dir = os.path.join(state.base_dir, "temp_uploads")
-        os.makedirs(temp_dir, exist_ok=True)
-        ref_audio_path = os.path.join(temp_dir, f"{job_id}_{ref_audio.filename}")
-        with open(ref_audio_path, "wb") as f:
-            content = await ref_audio.read()
-            f.write(content)
+        ref_audio_path = os.path.join(UPLOADS_DIR, f"{job_id}_{ref_audio.filename}")
+        ref_hash = await run_in_threadpool(_save_upload, ref_audio, ref_audio_path)
     
     job = Job(job_id, {
         "text": text,
@@ -308,13 +395,13 @@ async def api_generate_async(
         "cfg_weight": cfg_weight,
         "seed": seed,
         "ref_audio_path": ref_audio_path,
+        "ref_hash": ref_hash,
     })
     
-    with job_lock:
-        jobs[job_id] = job
+    add_job(job)
     
-    # Arka planda işle
-    background_tasks.add_task(process_tts_job, job)
+    # Worker kuyruğuna ekle
+    job_queue.put(job)
     
     return {
         "job_id": job_id,
@@ -334,7 +421,7 @@ async def api_job_status(job_id: str):
     - `completed`: Tamamlandı (download_url mevcut)
     - `failed`: Hata oluştu (error mesajı mevcut)
     """
-    job = jobs.get(job_id)
+    job = get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job bulunamadı")
     
@@ -359,7 +446,7 @@ async def api_job_download(job_id: str):
     
     Job durumu `completed` olmalıdır.
     """
-    job = jobs.get(job_id)
+    job = get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job bulunamadı")
     
@@ -380,8 +467,65 @@ async def api_job_download(job_id: str):
 # SYNC GENERATE (Eski - Kısa metinler için)
 # ===================================================================
 
+def _persist_wav(audio_bytes: bytes, filepath: str):
+    """Sync üretimin kalıcı kopyasını (encode edilmiş WAV) diske yaz"""
+    try:
+        with open(filepath, "wb") as f:
+            f.write(audio_bytes)
+    except Exception as e:
+        logger.error(f"[API] Failed to persist {filepath}: {e}")
+
+
+def _synthesize_wav(
+    text: str,
+    language: str,
+    ref_audio_path: Optional[str],
+    ref_hash: Optional[str],
+    exaggeration: float,
+    cfg_weight: float,
+    seed: int,
+    cache_results: bool,
+) -> Tuple[bytes, str]:
+    """Sync üretim: metni sese çevir, encode edilmiş WAV ve kayıt yolunu döndür"""
+    tts = state.tts_model
+    lang_code = language if language in LANGUAGES else "tr"
+    
+    if lang_code == "tr":
+        text = normalize_text(text)
+    
+    chunks = split_into_sentences(text, max_chars=200)
+    audio_segments = generate_chunks(
+        tts,
+        chunks,
+        language_id=lang_code,
+        audio_prompt_path=ref_audio_path,
+        ref_hash=ref_hash,
+        exaggeration=exaggeration,
+        cfg_weight=cfg_weight,
+        seed=seed,
+        cache_results=cache_results,
+        log_prefix="[API] ",
+        autocast_dtype=state.autocast_dtype,
+    )
+    
+    if len(audio_segments) > 1:
+        wav = merge_audio_with_crossfade(audio_segments, tts.sr, release=True)
+    else:
+        wav = audio_segments[0]
+    
+    wav = state.audio_processor.process(wav, tts.sr)
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filepath = os.path.join(state.outputs_dir, f"api_{timestamp}.wav")
+    
+    buffer = io.BytesIO()
+    write_wav(buffer, wav, tts.sr)
+    return buffer.getvalue(), filepath
+
+
 @api_app.post("/generate", tags=["🎤 Ses Üretimi"], summary="Sync Ses Üret (Kısa Metinler)")
 async def api_generate(
+    background_tasks: BackgroundTasks,
     text: str = Form(..., description="Sese dönüştürülecek metin"),
     language: str = Form("tr", description="Dil kodu (tr, en, de, fr, ...)"),
     preset: Optional[str] = Form(None, description="Ses şablonu"),
@@ -398,72 +542,27 @@ async def api_generate(
         text = text.strip()
         if not text:
             raise HTTPException(status_code=400, detail="Metin boş olamaz")
+        _validate_preset(preset)
         
-        if preset and preset in PRESETS:
-            exaggeration = PRESETS[preset]["exaggeration"]
-            cfg_weight = PRESETS[preset]["cfg_weight"]
+        exaggeration, cfg_weight = resolve_preset(preset, exaggeration, cfg_weight)
         
-        actual_seed = seed if seed >= 0 else random.randint(0, 999999)
-        torch.manual_seed(actual_seed)
+        actual_seed = seed if seed >= 0 else secrets.randbits(31)
         
         ref_audio_path = None
+        ref_hash = None
         if ref_audio:
-            temp_dir = os.path.join(state.base_dir, "temp_uploads")
-            os.makedirs(temp_dir, exist_ok=True)
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            ref_audio_path = os.path.join(temp_dir, f"upload_{timestamp}_{ref_audio.filename}")
-            with open(ref_audio_path, "wb") as f:
-                content = await ref_audio.read()
-                f.write(content)
-
-        tts = state.tts_model
-        lang_code = language if language in LANGUAGES else "tr"
-        
-        if lang_code == "tr":
-            text = normalize_text(text)
-        
-        chunks = split_into_sentences(text, max_chars=200)
-        audio_segments = []
-
-        for i, chunk in enumerate(chunks):
-            chunk_seed = actual_seed + i
-            wav_chunk = None
-            
-            for attempt in range(3):
-                try:
-                    current_seed = chunk_seed + (attempt * 100)
-                    torch.manual_seed(current_seed)
-                    if torch.cuda.is_available():
-                        torch.cuda.manual_seed(current_seed)
-                        
-                    wav_chunk = tts.generate(
-                        chunk, 
-                        language_id=lang_code, 
-                        audio_prompt_path=ref_audio_path, 
-                        exaggeration=exaggeration, 
-                        cfg_weight=cfg_weight
-                    )
-                    break
-                except RuntimeError as e:
-                    if attempt == 2:
-                        wav_chunk = torch.zeros(1, int(tts.sr * 0.5))
-            
-            if wav_chunk is not None:
-                audio_segments.append(wav_chunk)
-        
-        if len(audio_segments) > 1:
-            wav = merge_audio_with_crossfade(audio_segments, tts.sr)
-        else:
-            wav = audio_segments[0]
-        
-        audio_processor = AudioProcessor(state.audio_config)
-        wav = audio_processor.process(wav, tts.sr)
-        
-        os.makedirs(state.outputs_dir, exist_ok=True)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"api_{timestamp}.wav"
-        filepath = os.path.join(state.outputs_dir, filename)
-        ta.save(filepath, wav, tts.sr)
+            ref_audio_path = os.path.join(UPLOADS_DIR, f"upload_{timestamp}_{ref_audio.filename}")
+            ref_hash = await run_in_threadpool(_save_upload, ref_audio, ref_audio_path)
+
+        # Model çalıştırma event loop'u bloklamasın
+        audio_bytes, filepath = await run_in_threadpool(
+            _synthesize_wav,
+            text, language, ref_audio_path, ref_hash,
+            exaggeration, cfg_weight, actual_seed, seed >= 0,
+        )
+        filename = os.path.basename(filepath)
+        background_tasks.add_task(_persist_wav, audio_bytes, filepath)
         
         # Cleanup
         if ref_audio_path and os.path.exists(ref_audio_path):
@@ -471,15 +570,15 @@ async def api_generate(
                 os.remove(ref_audio_path)
             except:
                 pass
-
-        with open(filepath, "rb") as f:
-            audio_bytes = f.read()
         
-        return StreamingResponse(
-            io.BytesIO(audio_bytes),
+        # Tek parça gönder; BytesIO üzerinde StreamingResponse satır satır iterate eder
+        return Response(
+            audio_bytes,
             media_type="audio/wav",
             headers={"Content-Disposition": f"attachment; filename={filename}"}
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"[API] Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
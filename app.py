@@ -5,8 +5,8 @@ AutomationX TTS
 import gradio as gr
 import uvicorn
 import os
-from dotenv import load_dotenv
 
+# .env, core paketi import edilirken yüklenir
 from core import (
     get_state,
     logger,
@@ -14,9 +14,6 @@ from core import (
 from api import api_app
 from ui import create_ui
 
-# Environment yükle
-load_dotenv()
-
 state = get_state()
 
 gradio_ui = create_ui()
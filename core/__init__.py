@@ -2,6 +2,11 @@
 AutomationX TTS - Core Module
 """
 
+# .env ilk iş yüklenir: exceptions (LOG_TYPE) ve cache (IDLE_TIMEOUT, MAX_MODELS,
+# *_CACHE_SIZE...) ayarlarını import anında okur
+from .env import load_env
+load_env()
+
 from .exceptions import (
     TTSError,
     ModelLoadError,
@@ -19,10 +24,11 @@ from .cache import model_cache
 from .normalizer import normalize_text
 from .audio_processor import AudioProcessor
 from .constants import (
-    LANGUAGES, LANGUAGE_CODES, PRESETS, PRESET_KEYS, PRESET_GROUPS,
-    get_language_name_tr, get_preset_name_tr, get_language_choices_tr, get_preset_choices_tr
+    LANGUAGES, LANGUAGE_CODES, PRESETS, PRESET_KEYS, PRESET_VALUES, PRESET_GROUPS,
+    resolve_preset, get_language_name_tr, get_preset_name_tr, get_language_choices_tr, get_preset_choices_tr
 )
-from .utils import split_into_sentences, merge_audio_with_crossfade
+from .utils import split_into_sentences, merge_audio_with_crossfade, write_wav
+from .generation import generate_chunks
 from . import database
 
 __all__ = [
@@ -50,8 +56,10 @@ __all__ = [
     "LANGUAGE_CODES",
     "PRESETS",
     "PRESET_KEYS",
+    "PRESET_VALUES",
     "PRESET_GROUPS",
     # Helper functions
+    "resolve_preset",
     "get_language_name_tr",
     "get_preset_name_tr",
     "get_language_choices_tr",
@@ -59,6 +67,9 @@ __all__ = [
     # Utils
     "split_into_sentences",
     "merge_audio_with_crossfade",
+    "write_wav",
+    # Generation
+    "generate_chunks",
     # Database
     "database",
     # Logging
@@ -0,0 +1,48 @@
+"""
+AutomationX TTS - Audio Kernels
+Numba ile derlenen tek geçişli ses işleme çekirdekleri.
+"""
+
+import numpy as np
+from numba import njit
+
+
+@njit(fastmath=True, cache=True)
+def noise_gate_inplace(x: np.ndarray, threshold: float, kernel_size: int) -> None:
+    """
+    Noise gate'i [kanal, örnek] buffer üzerinde yerinde uygula.
+
+    Her örnek, etrafındaki kernel_size'lık penceredeki eşik üstü örneklerin
+    oranı ile çarpılır (sıfır padding'li kayan ortalama). Pencere toplamı
+    tek bir tamsayı olarak tutulur; yerinde yazıldığı için pencereden çıkan
+    örneklerin maske değeri halka buffer'da saklanır.
+
+    Seri derlenir (parallel=False): ses mono olduğu için prange kazanç
+    sağlamaz, paralel katman ise worker thread'lerinden çağrıldığında
+    süreç kapanışını kilitleyebilir.
+    """
+    channels, n = x.shape
+    half = kernel_size // 2
+    inv = 1.0 / kernel_size
+
+    for c in range(channels):
+        ring = np.zeros(kernel_size, dtype=np.uint8)
+        total = 0
+
+        # i = 0 penceresinin ilk yarısı: [0, half)
+        for j in range(min(half, n)):
+            m = 1 if abs(x[c, j]) > threshold else 0
+            ring[j % kernel_size] = m
+            total += m
+
+        for i in range(n):
+            # Çıkan örnek ile giren örnek aynı halka yuvasını paylaşır, önce çıkar
+            j = i - half - 1
+            if j >= 0:
+                total -= ring[j % kernel_size]
+            j = i + half
+            if j < n:
+                m = 1 if abs(x[c, j]) > threshold else 0
+                ring[j % kernel_size] = m
+                total += m
+            x[c, i] *= total * inv
@@ -3,76 +3,135 @@ AutomationX TTS - Audio Processing Filters
 Ses kalitesini artıran filtreler
 """
 
+from functools import lru_cache
+
+import numpy as np
 import torch
-import torchaudio.functional as F
+from scipy import signal
+
+from .utils import to_host
 
+try:
+    from ._audio_kernels import noise_gate_inplace
+except ImportError:  # numba yoksa torch yolu kullanılır
+    noise_gate_inplace = None
 
-def apply_lowpass(wav: torch.Tensor, sr: int, cutoff: int = 10000) -> torch.Tensor:
-    """Lowpass filter - yüksek frekanslı tıslama/cızırtıyı keser"""
-    return F.lowpass_biquad(wav, sr, cutoff_freq=cutoff)
 
+@lru_cache(maxsize=32)
+def design_bandpass(sr: int, highpass: int = 80, lowpass: int = 10000) -> np.ndarray:
+    """
+    Highpass + lowpass için 2. derece Butterworth SOS katsayıları.
+    Nyquist'e ulaşan lowpass kesimi atlanır. Sonuç (sr, highpass, lowpass)
+    başına bir kez hesaplanır ve istekler arasında paylaşılır (değiştirmeyin).
+    """
+    sections = [signal.butter(2, highpass, btype="highpass", fs=sr, output="sos")]
+    if lowpass < sr / 2:
+        sections.append(signal.butter(2, lowpass, btype="lowpass", fs=sr, output="sos"))
+    return np.vstack(sections).astype(np.float32)
 
-def apply_highpass(wav: torch.Tensor, sr: int, cutoff: int = 80) -> torch.Tensor:
-    """Highpass filter - düşük frekanslı uğultuyu keser"""
-    return F.highpass_biquad(wav, sr, cutoff_freq=cutoff)
+
+def apply_bandpass(wav: torch.Tensor, sos: np.ndarray) -> torch.Tensor:
+    """
+    Bandpass filter - düşük frekanslı uğultuyu ve yüksek frekanslı tıslamayı keser.
+    Tüm biquad bölümleri tek bir sosfilt geçişinde uygulanır.
+    """
+    out = signal.sosfilt(sos, wav.detach().cpu().numpy(), axis=-1)
+    np.clip(out, -1.0, 1.0, out=out)
+    return torch.from_numpy(out).to(wav.device)
+
+
+def db_to_linear(db: float) -> float:
+    """dB değerini lineer genliğe çevir"""
+    return 10 ** (db / 20)
 
 
 def apply_noise_gate(wav: torch.Tensor, threshold_db: float = -45) -> torch.Tensor:
     """
     Noise Gate - sessiz kısımlardaki parazitleri sıfırlar.
     """
-    threshold_linear = 10 ** (threshold_db / 20)
-    abs_wav = torch.abs(wav)
-    gate_mask = (abs_wav > threshold_linear).float()
-    
-    # Yumuşak geçiş için smoothing
+    return noise_gate_linear(wav, db_to_linear(threshold_db))
+
+
+def noise_gate_linear(wav: torch.Tensor, threshold_linear: float) -> torch.Tensor:
+    """Noise gate, eşik lineer genlik olarak verilir."""
     kernel_size = 101
-    if wav.shape[1] > kernel_size:
+    
+    # Numba varsa tek geçişte: her örnek bir okuma + bir yazma
+    if noise_gate_inplace is not None and wav.shape[-1] > kernel_size and wav.device.type == "cpu":
+        out = wav.detach().reshape(-1, wav.shape[-1]).numpy().copy()
+        noise_gate_inplace(out, threshold_linear, kernel_size)
+        return torch.from_numpy(out).reshape(wav.shape)
+    
+    gate_mask = torch.abs(wav) > threshold_linear
+    
+    # Yumuşak geçiş için smoothing: kümülatif toplam ile O(N) kayan ortalama
+    # (avg_pool1d ile aynı: sıfır padding, pencere boyuna bölme)
+    if wav.shape[-1] > kernel_size:
         padding = kernel_size // 2
-        gate_mask_smooth = torch.nn.functional.avg_pool1d(
-            gate_mask.unsqueeze(0), kernel_size, stride=1, padding=padding
-        ).squeeze(0)
-        gate_mask_smooth = torch.clamp(gate_mask_smooth, 0, 1)
+        # Baştaki ek sıfır, pencere toplamını cs[i + K] - cs[i] yapar
+        padded = torch.nn.functional.pad(gate_mask.to(torch.int32), (padding + 1, padding))
+        cs = torch.cumsum(padded, dim=-1)
+        gate_mask_smooth = (cs[..., kernel_size:] - cs[..., :-kernel_size]).to(wav.dtype) / kernel_size
     else:
-        gate_mask_smooth = gate_mask
+        gate_mask_smooth = gate_mask.to(wav.dtype)
     
-    return wav * gate_mask_smooth
+    # Maske buffer'ı çıkış olarak kullanılır (ek allocation yok)
+    return gate_mask_smooth.mul_(wav)
 
 
 def apply_normalize(wav: torch.Tensor, target_db: float = -3.0) -> torch.Tensor:
-    """Normalize - optimal ses seviyesine çeker."""
-    peak = torch.max(torch.abs(wav))
+    """
+    Normalize - optimal ses seviyesine çeker.
+    Kazanç yerinde uygulanır (wav değişir); dönen tensor aynı tensordür.
+    """
+    return normalize_linear(wav, db_to_linear(target_db))
+
+
+def normalize_linear(wav: torch.Tensor, target_linear: float) -> torch.Tensor:
+    """Normalize, hedef tepe seviyesi lineer genlik olarak verilir (yerinde)."""
+    peak = wav.abs().amax()
     if peak > 0:
-        target_linear = 10 ** (target_db / 20)
-        gain = target_linear / peak
-        return wav * gain
+        wav.mul_(target_linear / peak)
     return wav
 
 
+NORMALIZE_TARGET_DB = -3.0
+
+
 class AudioProcessor:
-    """Ses işleme pipeline'ı."""
+    """
+    Ses işleme pipeline'ı.
+    Pipeline CPU'da çalışır: biquad filtreleri örnek örnek ilerleyen
+    (seri) bir özyineleme olduğu için GPU'da çok daha yavaştır. CUDA'daki
+    wav başta bir kez CPU'ya alınır, sonuç asıl cihaza geri taşınır.
+    """
     
     def __init__(self, config: dict):
         self.highpass_freq = config.get("highpass_freq", 80)
         self.lowpass_freq = config.get("lowpass_freq", 10000)
         self.noise_gate_threshold = config.get("noise_gate_threshold", -45)
         self.normalize_audio = config.get("normalize_audio", True)
+        
+        # dB -> lineer dönüşümleri her çağrıda değil, bir kez yap
+        self._gate_enabled = self.noise_gate_threshold > -100
+        self._gate_threshold_linear = db_to_linear(self.noise_gate_threshold)
+        self._normalize_target_linear = db_to_linear(NORMALIZE_TARGET_DB)
     
+    @torch.inference_mode()
     def process(self, wav: torch.Tensor, sr: int) -> torch.Tensor:
-        """Filtreleri sırayla uygula"""
-        
-        # 1. Highpass - düşük frekanslı uğultuyu kes
-        wav = apply_highpass(wav, sr, self.highpass_freq)
+        """Filtreleri sırayla uygula (autograd kaydı tutulmadan)"""
+        orig_device = wav.device
+        wav = to_host(wav)
         
-        # 2. Lowpass - yüksek frekanslı tıslamayı kes
-        wav = apply_lowpass(wav, sr, self.lowpass_freq)
+        # 1-2. Highpass + Lowpass - uğultu ve tıslamayı tek geçişte kes
+        wav = apply_bandpass(wav, design_bandpass(sr, self.highpass_freq, self.lowpass_freq))
         
         # 3. Noise Gate - sessiz kısımlardaki paraziti temizle
-        if self.noise_gate_threshold > -100:
-            wav = apply_noise_gate(wav, self.noise_gate_threshold)
+        if self._gate_enabled:
+            wav = noise_gate_linear(wav, self._gate_threshold_linear)
         
         # 4. Normalize - ses seviyesini optimize et
         if self.normalize_audio:
-            wav = apply_normalize(wav)
+            wav = normalize_linear(wav, self._normalize_target_linear)
         
-        return wav
+        return wav.to(orig_device, non_blocking=True)
@@ -5,27 +5,218 @@ AutomationX TTS - Model Cache with Idle Timeout
 import os
 import gc
 import time
+import hashlib
+import itertools
 import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 from typing import Any, Optional
 
 import torch
 
 
+# ===================================================================
+# REFERENCE AUDIO CONDITIONALS
+# ===================================================================
+
+def content_hasher(data: bytes = b"") -> "hashlib.blake2b":
+    """Referans ses içeriği için 128-bit hasher"""
+    return hashlib.blake2b(data, digest_size=16)
+
+
+def file_digest(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Dosya içeriğinin 128-bit hash'i (hex)"""
+    hasher = content_hasher()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+class ConditionalsCache:
+    """
+    Referans ses hash'i -> model conditionals (LRU).
+    Aynı referans ses için speaker embedding tekrar hesaplanmaz.
+    """
+    
+    def __init__(self, maxsize: int = 64):
+        self._items: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._maxsize = maxsize
+        self._builtin = None  # Modelin referanssız (varsayılan) sesi
+    
+    @property
+    def builtin(self) -> Any:
+        """Modelin yerleşik ses conditionals'ı"""
+        return self._builtin
+    
+    def set_builtin(self, conds: Any) -> None:
+        """Model yüklendiğinde yerleşik sesi sakla (LRU dışında tutulur)"""
+        self._builtin = conds
+    
+    def get(self, key: str) -> Any:
+        """Conditionals al, yoksa None döner"""
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key]
+    
+    def set(self, key: str, conds: Any) -> None:
+        """Conditionals kaydet, limit aşılırsa en eskiyi at"""
+        with self._lock:
+            self._items[key] = conds
+            self._items.move_to_end(key)
+            while len(self._items) > self._maxsize:
+                self._items.popitem(last=False)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._builtin = None
+    
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+# ===================================================================
+# GENERATED AUDIO CACHE
+# ===================================================================
+
+class ResultCache:
+    """
+    Üretilmiş chunk sesleri için LFU cache.
+    Key: (dil, ayarlar, seed, metin, referans ses) hash'i, değer: CPU waveform.
+    Eşit kullanımda büyük tensor önce atılır, böylece daha çok kayıt sığar.
+    """
+    
+    def __init__(self, capacity: int = 256):
+        self._items: dict = {}  # key -> [hit_count, tensor]
+        self._lock = threading.Lock()
+        self._capacity = capacity
+    
+    def get(self, key: bytes) -> Optional[torch.Tensor]:
+        """Ses al, yoksa None döner. Kullanım sayacını artırır."""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            item[0] += 1
+            return item[1]
+    
+    def set(self, key: bytes, wav: torch.Tensor) -> None:
+        """Ses kaydet, kapasite doluysa en az kullanılanı at"""
+        if self._capacity <= 0:
+            return
+        with self._lock:
+            if key not in self._items and len(self._items) >= self._capacity:
+                victim = min(
+                    self._items,
+                    key=lambda k: (self._items[k][0], -self._items[k][1].nbytes),
+                )
+                del self._items[victim]
+            self._items[key] = [1, wav]
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+    
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+# ===================================================================
+# MODEL CACHE
+# ===================================================================
+
+def _model_device(model: Any) -> str:
+    """Modelin bulunduğu cihaz"""
+    return str(getattr(model, "device", "cpu"))
+
+
+def _model_modules(model: Any) -> list:
+    """Modelin nn.Module alt modülleri"""
+    if isinstance(model, torch.nn.Module):
+        return [model]
+    return [v for v in vars(model).values() if isinstance(v, torch.nn.Module)]
+
+
+def _move_model(model: Any, device: str, non_blocking: bool = False) -> Any:
+    """Modeli alt modülleri ve conditionals'ı ile birlikte cihaza taşı"""
+    for module in _model_modules(model):
+        module.to(device, non_blocking=non_blocking)
+    
+    conds = getattr(model, "conds", None)
+    if conds is not None and hasattr(conds, "to"):
+        conds.to(device)
+    
+    if hasattr(model, "device"):
+        model.device = device
+    return model
+
+
+def _pin_model(model: Any) -> None:
+    """
+    CPU'daki ağırlıkları page-locked belleğe al.
+    Pinned bellekten GPU'ya kopya asenkron yapılabilir (non_blocking).
+    """
+    if not torch.cuda.is_available():
+        return
+    for module in _model_modules(model):
+        for t in itertools.chain(module.parameters(), module.buffers()):
+            if not t.is_pinned():
+                t.data = t.data.pin_memory()
+
+
+def _restore_model(model: Any, device: str) -> Any:
+    """
+    Pinned CPU ağırlıklarını ayrı bir CUDA stream'inde cihaza kopyala.
+    Host beklemez; varsayılan stream ilk kullanımdan önce kopyayı bekler.
+    """
+    if not device.startswith("cuda"):
+        return _move_model(model, device)
+    
+    stream = torch.cuda.Stream(device=device)
+    with torch.cuda.stream(stream):
+        _move_model(model, device, non_blocking=True)
+    torch.cuda.current_stream(device).wait_stream(stream)
+    return model
+
+
+COUNTER_LIMIT = 2 ** 31  # Hit sayacı doyma sınırı
+
+
 class ModelCache:
     """
     Singleton model cache with idle timeout.
-    Belirli süre kullanılmayan modeli bellekten kaldırır.
+    İki katmanlı: GPU'da idle kalan model önce CPU belleğine taşınır
+    (sonraki istekte disk yerine .to(device) ile döner), CPU'da da
+    idle kalırsa bellekten tamamen kaldırılır.
+    
+    Modeller erişim sırasına göre OrderedDict'te tutulur; idle kontrolü
+    get/set sırasında lazy yapılır. MAX_MODELS aşılırsa en az kullanılan
+    (hit sayacı en küçük) model atılır: sık kullanılan model, bir süre
+    idle kalsa bile tek seferlik yüklenen modelden önce atılmaz. Hiç istek gelmese de GPU belleğinin
+    boşalması için arka plan kontrolü isteğe bağlıdır (MODEL_IDLE_WATCHER).
+    
+    Üretim süresince model lease() ile kiralanır: kiralı model ne kadar
+    uzun sürerse sürsün idle sayılmaz, CPU'ya taşınmaz veya atılmaz.
     """
     _instance = None
     _lock = threading.Lock()
     
-
-    
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
-            cls._instance._models = {}
-            cls._instance._last_access = {}
+            cls._instance._models = OrderedDict()  # key -> (model, son erişim), eskiden yeniye
+            cls._instance._offloaded = {}  # CPU katmanındaki key -> asıl cihaz
+            cls._instance._counters = {}  # key -> hit sayacı
+            cls._instance._leases = {}  # key -> aktif kullanım (lease) sayısı
+            cls._instance._moving = set()  # Kilit dışında CPU'ya taşınmakta olan key'ler
+            cls._instance._moved = threading.Condition(cls._lock)  # Taşıma bitince haber verir
+            cls._instance._offload_enabled = os.getenv("MODEL_CPU_OFFLOAD", "True").lower() == "true"
+            cls._instance._max_models = max(1, int(os.getenv("MAX_MODELS", 1)))
+            cls._instance._watcher_enabled = os.getenv("MODEL_IDLE_WATCHER", "True").lower() == "true"
             
             # Fix: Check both variable names, prioritize IDLE_TIMEOUT as per .env.example
             timeout = os.getenv("IDLE_TIMEOUT", os.getenv("MODEL_IDLE_TIMEOUT", "600"))
@@ -36,39 +227,166 @@ class ModelCache:
                 
             cls._instance._cleanup_thread = None
             cls._instance._running = False
+            cls._instance._wakeup = threading.Event()  # Timeout değişince thread'i uyandırır
             # Check debug mode
             cls._instance._debug = os.getenv("LOG_TYPE", "console") == "console"
         return cls._instance
     
     def get(self, key: str) -> Any:
-        """Model al, yoksa None döner. Erişim zamanını günceller."""
+        """
+        Model al, yoksa None döner. Erişim zamanını günceller.
+        İstenen model önce tazelenir, lazy cleanup sonra yapılır: süresi
+        dolmuş olsa bile istenen model atılıp hemen geri yüklenmez.
+        """
+        model = None
         with self._lock:
-            if key in self._models:
-                self._last_access[key] = time.time()
-                return self._models[key]
-            return None
+            self._wait_move_locked(key)
+            entry = self._models.get(key)
+            if entry is not None:
+                model = self._restore_locked(key, entry[0])
+                self._models[key] = (model, time.time())
+                self._models.move_to_end(key)
+                self._hit(key)
+        self._check_and_cleanup()
+        return model
+    
+    def _wait_move_locked(self, key: str) -> None:
+        """Model CPU'ya taşınıyorsa bitmesini bekle (beklerken kilit bırakılır)"""
+        while key in self._moving:
+            self._moved.wait()
+    
+    def _restore_locked(self, key: str, model: Any) -> Any:
+        """CPU katmanındaki modeli asıl cihazına geri taşı (kilit tutulurken)"""
+        if key in self._offloaded:
+            device = self._offloaded.pop(key)
+            model = _restore_model(model, device)
+            if getattr(self, '_debug', False):
+                print(f"[ModelCache] '{key}' modeli CPU'dan {device} cihazına geri yüklendi.")
+        return model
+    
+    @contextmanager
+    def lease(self, model: Any):
+        """
+        Modeli blok boyunca kullanımda işaretle. Kiralı model idle watcher
+        tarafından taşınmaz/atılmaz; bırakılınca erişim zamanı yenilenir.
+        Cache'te olmayan (ör. atılmış) model olduğu gibi kullanılır.
+        """
+        with self._lock:
+            key = next((k for k, (m, _) in self._models.items() if m is model), None)
+            if key is not None:
+                self._wait_move_locked(key)
+                self._restore_locked(key, model)
+                self._leases[key] = self._leases.get(key, 0) + 1
+        try:
+            yield model
+        finally:
+            if key is not None:
+                with self._lock:
+                    count = self._leases.pop(key) - 1
+                    if count:
+                        self._leases[key] = count
+                    if key in self._models:
+                        # Idle süresi işin bittiği andan başlar
+                        self._models[key] = (model, time.time())
+                        self._models.move_to_end(key)
+                        if self._watcher_enabled and self._timeout_seconds > 0:
+                            self._start_cleanup_thread()
     
     def set(self, key: str, model: Any) -> None:
-        """Model kaydet ve cleanup thread'i başlat"""
+        """Model kaydet, limit aşılırsa en az kullanılan modeli at"""
+        self._check_and_cleanup()
         with self._lock:
-            self._models[key] = model
-            self._last_access[key] = time.time()
-            self._start_cleanup_thread()
+            self._models[key] = (model, time.time())
+            self._models.move_to_end(key)
+            self._offloaded.pop(key, None)
+            self._counters.setdefault(key, 0)
+            evicted = []
+            while len(self._models) > self._max_models:
+                victim = min((k for k in self._counters if k != key), key=self._counters.get)
+                evicted.append(victim)
+                self._models.pop(victim)
+                self._counters.pop(victim)
+            if self._watcher_enabled and self._timeout_seconds > 0:
+                self._start_cleanup_thread()
+        
+        for old_key in evicted:
+            print(f"[ModelCache] '{old_key}' modeli kapasite (MAX_MODELS={self._max_models}) nedeniyle kaldırılıyor...")
+            self.clear(old_key)
+    
+    def _hit(self, key: str) -> None:
+        """Hit sayacını artır, doyunca tüm sayaçları yarıla (eski kullanım söner)"""
+        count = self._counters.get(key, 0) + 1
+        self._counters[key] = count
+        if count >= COUNTER_LIMIT:
+            for k in self._counters:
+                self._counters[k] >>= 1
     
     def has(self, key: str) -> bool:
-        """Model var mı?"""
-        return key in self._models
+        """Model var mı? (GPU veya CPU katmanında)"""
+        with self._lock:
+            return key in self._models
+    
+    def _is_busy_locked(self, key: str, idle_before: Optional[float]) -> bool:
+        """Model kullanımda mı ya da idle_before'dan sonra erişildi mi? (kilit tutulurken)"""
+        if key in self._leases:
+            return True
+        entry = self._models.get(key)
+        return idle_before is not None and entry is not None and entry[1] >= idle_before
     
-    def clear(self, key: str = None) -> None:
-        """Cache temizle ve GPU belleği serbest bırak"""
+    def offload(self, key: str, idle_before: Optional[float] = None) -> None:
+        """
+        Modeli CPU belleğine taşı, GPU belleğini serbest bırak.
+        Kiralı model taşınmaz; idle_before verilirse o zamandan sonra
+        erişilen model de taşınmaz (watcher kararı kilit altında doğrulanır).
+        
+        Taşıma (büyük modelde saniyeler) kilit dışında yapılır; bu sürede
+        has/get_status beklemez, aynı modeli isteyen get/lease ise taşıma
+        bitince modeli geri yükler.
+        """
         with self._lock:
+            entry = self._models.get(key)
+            if (entry is None or key in self._offloaded or key in self._moving
+                    or self._is_busy_locked(key, idle_before)):
+                return
+            model = entry[0]
+            device = _model_device(model)
+            self._moving.add(key)
+        
+        try:
+            _move_model(model, "cpu")
+            _pin_model(model)
+        finally:
+            with self._lock:
+                self._moving.discard(key)
+                entry = self._models.get(key)
+                if entry is not None and entry[0] is model:
+                    self._offloaded[key] = device
+                    self._models[key] = (model, time.time())
+                    self._models.move_to_end(key)
+                self._moved.notify_all()
+        
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    
+    def clear(self, key: str = None, idle_before: Optional[float] = None) -> None:
+        """
+        Cache temizle ve GPU belleği serbest bırak.
+        idle_before verilirse kiralı veya o zamandan sonra erişilen model atılmaz.
+        """
+        with self._lock:
+            if key and idle_before is not None and self._is_busy_locked(key, idle_before):
+                return
             if key:
-                if key in self._models:
-                    del self._models[key]
-                    self._last_access.pop(key, None)
+                self._models.pop(key, None)
+                self._offloaded.pop(key, None)
+                self._counters.pop(key, None)
             else:
                 self._models.clear()
-                self._last_access.clear()
+                self._offloaded.clear()
+                self._counters.clear()
+            
+            # Conditionals modelin cihazında tutulur, model ile birlikte bırak
+            conditionals_cache.clear()
             
             # GPU belleği temizle
             if torch.cuda.is_available():
@@ -103,51 +421,81 @@ class ModelCache:
         self._cleanup_thread = threading.Thread(target=self._cleanup_loop, daemon=True)
         self._cleanup_thread.start()
     
+    def _next_deadline(self) -> Optional[float]:
+        """
+        En yakın idle süresi dolma zamanı. Modeller erişim sırasına göre
+        tutulduğu için en erken dolan ilk kiralı olmayan kayıttır.
+        """
+        if self._timeout_seconds <= 0:
+            return None
+        # Kiralı modeller idle sayılmaz; bırakıldıklarında thread yeniden başlar
+        for key, (_, last_access) in self._models.items():
+            if key not in self._leases:
+                return last_access + self._timeout_seconds
+        return None
+    
     def _cleanup_loop(self) -> None:
-        """Arka planda idle modelleri kontrol et ve temizle"""
-        check_interval = 60  # Her 60 saniyede bir kontrol
-        
-        while self._running:
-            time.sleep(check_interval)
-            self._check_and_cleanup()
+        """Arka planda idle modelleri, süreleri dolduğu anda temizle"""
+        while True:
+            with self._lock:
+                deadline = self._next_deadline()
+                if deadline is None:
+                    # Idle olabilecek model kalmadıysa (veya timeout kapalıysa) thread'i durdur
+                    self._running = False
+                    return
             
-            # Hiç model kalmadıysa thread'i durdur
-            if not self._models:
-                self._running = False
-                break
+            # Sabit aralıkla yoklamak yerine ilk süre dolumuna kadar uyu.
+            # Bu sırada model kullanılırsa süresi ileri kayar; uyanınca
+            # dolan yoksa yeni zamana göre tekrar beklenir.
+            self._wakeup.wait(max(0.0, deadline - time.time()))
+            self._wakeup.clear()
+            self._check_and_cleanup()
     
     def _check_and_cleanup(self) -> None:
         """Timeout'a uğramış modelleri temizle"""
         if self._timeout_seconds <= 0:
             return  # Timeout devre dışı
         
-        current_time = time.time()
+        deadline = time.time() - self._timeout_seconds
         keys_to_remove = []
         
         with self._lock:
-            for key, last_access in self._last_access.items():
-                idle_time = current_time - last_access
-                if idle_time > self._timeout_seconds:
-                    keys_to_remove.append(key)
+            # En eskiden yeniye sıralı: ilk taze modelde dur, kiralıları atla
+            for key, (model, last_access) in self._models.items():
+                if key in self._leases:
+                    continue
+                if last_access >= deadline:
+                    break
+                keys_to_remove.append((key, model))
         
-        for key in keys_to_remove:
-            print(f"[ModelCache] '{key}' modeli {self._timeout_seconds}s idle kaldı, bellekten kaldırılıyor...")
-            self.clear(key)
+        # Modeller kilit dışında taşınır/silinir; offload/clear kendi kilidini alır
+        # ve arada model kiralandıysa ya da kullanıldıysa dokunmaz
+        for key, model in keys_to_remove:
+            if self._offload_enabled and key not in self._offloaded and _model_device(model).startswith("cuda"):
+                print(f"[ModelCache] '{key}' modeli {self._timeout_seconds}s idle kaldı, CPU belleğine taşınıyor...")
+                self.offload(key, idle_before=deadline)
+            else:
+                print(f"[ModelCache] '{key}' modeli {self._timeout_seconds}s idle kaldı, bellekten kaldırılıyor...")
+                self.clear(key, idle_before=deadline)
     
     def get_status(self) -> dict:
         """Cache durumunu döndür"""
+        # Kilit sadece kopya için tutulur, rapor kilit dışında hazırlanır
+        with self._lock:
+            snapshot = [(key, last_access, key in self._offloaded) for key, (_, last_access) in self._models.items()]
+            timeout = self._timeout_seconds
+        
         status = {}
         current_time = time.time()
-        
-        with self._lock:
-            for key in self._models:
-                idle_seconds = int(current_time - self._last_access.get(key, current_time))
-                remaining = max(0, self._timeout_seconds - idle_seconds)
-                status[key] = {
-                    "idle_seconds": idle_seconds,
-                    "timeout_seconds": self._timeout_seconds,
-                    "remaining_seconds": remaining,
-                }
+        for key, last_access, offloaded in snapshot:
+            idle_seconds = int(current_time - last_access)
+            remaining = max(0, timeout - idle_seconds)
+            status[key] = {
+                "tier": "cpu" if offloaded else "device",
+                "idle_seconds": idle_seconds,
+                "timeout_seconds": timeout,
+                "remaining_seconds": remaining,
+            }
         
         return status
     
@@ -158,7 +506,10 @@ class ModelCache:
     @timeout_seconds.setter
     def timeout_seconds(self, value: int) -> None:
         self._timeout_seconds = max(0, value)  # 0 = devre dışı
+        self._wakeup.set()
 
 
-# Global instance
+# Global instances
+conditionals_cache = ConditionalsCache(int(os.getenv("COND_CACHE_SIZE", 64)))
+result_cache = ResultCache(int(os.getenv("RESULT_CACHE_SIZE", 256)))
 model_cache = ModelCache()
@@ -3,6 +3,8 @@ AutomationX TTS - Constants
 Diller ve şablonlar için merkezi tanımlar
 """
 
+from typing import Optional, Tuple
+
 # Dil yapısı: key (İngilizce kod), name_tr, name_en
 LANGUAGES = {
     "tr": {
@@ -206,24 +208,36 @@ PRESET_GROUPS = {
 # Helper fonksiyonlar
 def get_language_name_tr(code: str) -> str:
     """Dil kodundan Türkçe isim döndür"""
-    return LANGUAGES.get(code, {}).get("name_tr", code)
+    return LANG_NAME_TR_BY_CODE.get(code, code)
 
 
 def get_preset_name_tr(key: str) -> str:
     """Preset key'inden Türkçe isim döndür"""
-    return PRESETS.get(key, {}).get("name_tr", key)
+    return PRESET_NAME_TR_BY_KEY.get(key, key)
+
 
+def resolve_preset(preset: Optional[str], exaggeration: float, cfg_weight: float) -> Tuple[float, float]:
+    """Preset varsa (exaggeration, cfg_weight) değerlerini döndür, yoksa verilenleri"""
+    return PRESET_VALUES.get(preset, (exaggeration, cfg_weight)) if preset else (exaggeration, cfg_weight)
 
-def get_language_choices_tr() -> list:
-    """UI için Türkçe dil seçenekleri: [(Türkçe isim, kod), ...]"""
-    return [(v["name_tr"], k) for k, v in LANGUAGES.items()]
 
+def get_language_choices_tr() -> tuple:
+    """UI için Türkçe dil seçenekleri: ((Türkçe isim, kod), ...)"""
+    return LANGUAGE_CHOICES_TR
 
-def get_preset_choices_tr() -> list:
-    """UI için Türkçe preset seçenekleri: [(Türkçe isim, key), ...]"""
-    return [(v["name_tr"], k) for k, v in PRESETS.items()]
+
+def get_preset_choices_tr() -> tuple:
+    """UI için Türkçe preset seçenekleri: ((Türkçe isim, key), ...)"""
+    return PRESET_CHOICES_TR
 
 
 # API için basit listeler
 LANGUAGE_CODES = list(LANGUAGES.keys())
 PRESET_KEYS = list(PRESETS.keys())
+PRESET_VALUES = {k: (v["exaggeration"], v["cfg_weight"]) for k, v in PRESETS.items()}
+
+# Import anında bir kez hazırlanan UI seçenekleri ve isim tabloları
+LANG_NAME_TR_BY_CODE = {k: v["name_tr"] for k, v in LANGUAGES.items()}
+PRESET_NAME_TR_BY_KEY = {k: v["name_tr"] for k, v in PRESETS.items()}
+LANGUAGE_CHOICES_TR = tuple((name, k) for k, name in LANG_NAME_TR_BY_CODE.items())
+PRESET_CHOICES_TR = tuple((name, k) for k, name in PRESET_NAME_TR_BY_KEY.items())
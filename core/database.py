@@ -6,11 +6,17 @@ import sqlite3
 import json
 import os
 import shutil
-from typing import List, Dict, Optional, Any
+import threading
+from typing import List, Dict, Optional, Any, Union
 from contextlib import contextmanager
 
 from .exceptions import DatabaseError, logger
 
+try:
+    import orjson
+except ImportError:  # orjson opsiyonel, yoksa stdlib json
+    orjson = None
+
 # ===================================================================
 # DATABASE CONFIGURATION
 # ===================================================================
@@ -35,25 +41,69 @@ CREATE INDEX IF NOT EXISTS idx_created_at ON history(created_at DESC);
 CREATE INDEX IF NOT EXISTS idx_filename ON history(filename);
 """
 
+# Bağlantı açılışında bir kez uygulanır
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-20000",
+)
+
+MIGRATE_SQL = """
+    INSERT OR IGNORE INTO history 
+    (timestamp, text, language, seed, exaggeration, cfg_weight, filename)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+INSERT_SQL = """
+    INSERT INTO history 
+    (timestamp, text, language, seed, exaggeration, cfg_weight, filename)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
 
 # ===================================================================
 # CONNECTION MANAGEMENT
 # ===================================================================
 
+_local = threading.local()  # Thread başına db_path -> kalıcı bağlantı
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    """Thread'in bu veritabanı için kalıcı bağlantısı (ilk kullanımda açılır)"""
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        connections[db_path] = conn
+    return conn
+
+
 @contextmanager
 def get_connection(db_path: str):
-    """Context manager for database connections"""
+    """
+    Context manager for database connections.
+    Bağlantı kapatılmaz; aynı thread'de sonraki çağrılar tekrar kullanır.
+    Bu yüzden herhangi bir hatada açık transaction geri alınır: aksi halde
+    yarım kalan satırlar thread'in sonraki commit'i ile yazılırdı.
+    """
     conn = None
     try:
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
+        conn = _connect(db_path)
         yield conn
-    except sqlite3.Error as e:
-        logger.error(f"Database error: {e}")
-        raise DatabaseError(f"Veritabanı hatası: {e}")
-    finally:
+    except BaseException as e:
         if conn:
-            conn.close()
+            conn.rollback()
+        if isinstance(e, sqlite3.Error):
+            logger.error(f"Database error: {e}")
+            raise DatabaseError(f"Veritabanı hatası: {e}")
+        raise
 
 
 def init_database(outputs_dir: str) -> str:
@@ -84,34 +134,33 @@ def migrate_from_json(json_path: str, db_path: str) -> int:
     Returns: Migrate edilen kayıt sayısı
     """
     try:
-        with open(json_path, "r", encoding="utf-8") as f:
-            history = json.load(f)
+        if orjson is not None:
+            with open(json_path, "rb") as f:
+                history = orjson.loads(f.read())
+        else:
+            with open(json_path, "r", encoding="utf-8") as f:
+                history = json.load(f)
         
         if not history:
             return 0
         
-        migrated = 0
+        rows = [
+            (
+                entry.get("timestamp", ""),
+                entry.get("text", ""),
+                entry.get("language", "tr"),
+                entry.get("seed", -1),
+                entry.get("exaggeration", 0.5),
+                entry.get("cfg_weight", 0.5),
+                entry.get("filename", ""),
+            )
+            for entry in history
+        ]
+        
+        # Tek prepared statement, tek transaction; duplicate filename atlanır
         with get_connection(db_path) as conn:
-            cursor = conn.cursor()
-            for entry in history:
-                try:
-                    cursor.execute("""
-                        INSERT OR IGNORE INTO history 
-                        (timestamp, text, language, seed, exaggeration, cfg_weight, filename)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        entry.get("timestamp", ""),
-                        entry.get("text", ""),
-                        entry.get("language", "tr"),
-                        entry.get("seed", -1),
-                        entry.get("exaggeration", 0.5),
-                        entry.get("cfg_weight", 0.5),
-                        entry.get("filename", ""),
-                    ))
-                    if cursor.rowcount > 0:
-                        migrated += 1
-                except sqlite3.IntegrityError:
-                    continue  # Duplicate filename, skip
+            cursor = conn.executemany(MIGRATE_SQL, rows)
+            migrated = cursor.rowcount
             conn.commit()
         
         # JSON'ı yedekle
@@ -129,23 +178,24 @@ def migrate_from_json(json_path: str, db_path: str) -> int:
 # CRUD OPERATIONS
 # ===================================================================
 
-def add_entry(db_path: str, entry: Dict[str, Any]) -> bool:
-    """Yeni kayıt ekle"""
+def _entry_row(entry: Dict[str, Any]) -> tuple:
+    return (
+        entry["timestamp"],
+        entry["text"],
+        entry["language"],
+        entry["seed"],
+        entry["exaggeration"],
+        entry["cfg_weight"],
+        entry["filename"],
+    )
+
+
+def add_entry(db_path: str, entry: Union[Dict[str, Any], List[Dict[str, Any]]]) -> bool:
+    """Yeni kayıt ekle (tek kayıt veya liste, tek transaction)"""
+    entries = [entry] if isinstance(entry, dict) else entry
     try:
         with get_connection(db_path) as conn:
-            conn.execute("""
-                INSERT INTO history 
-                (timestamp, text, language, seed, exaggeration, cfg_weight, filename)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (
-                entry["timestamp"],
-                entry["text"],
-                entry["language"],
-                entry["seed"],
-                entry["exaggeration"],
-                entry["cfg_weight"],
-                entry["filename"],
-            ))
+            conn.executemany(INSERT_SQL, map(_entry_row, entries))
             conn.commit()
         return True
     except Exception as e:
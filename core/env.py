@@ -0,0 +1,40 @@
+"""
+AutomationX TTS - Environment
+.env dosyası, env okuyan modüllerden (logging, cache) önce yüklenir.
+"""
+
+import os
+
+DEFAULT_ENV_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env")
+
+_env_loaded = False
+
+
+def load_env(path: str = DEFAULT_ENV_PATH) -> None:
+    """
+    .env dosyasını bir kez oku (KEY=VALUE satırları).
+    Ortamda zaten tanımlı değişkenler ezilmez.
+    """
+    global _env_loaded
+    if _env_loaded:
+        return
+    _env_loaded = True
+    
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#") or "=" not in line:
+                continue
+            key, _, value = line.removeprefix("export ").partition("=")
+            value = value.strip()
+            quote = value[:1]
+            end = value.find(quote, 1) if quote in ("'", '"') else -1
+            if end > 0:
+                # Tırnaklı değer: kapanış tırnağından sonrası (ör. yorum) atılır,
+                # tırnak içindeki " #" değerin parçasıdır
+                value = value[1:end]
+            else:
+                value = value.split(" #", 1)[0].rstrip()  # Satır sonu yorumu
+            os.environ.setdefault(key.strip(), value)
@@ -3,15 +3,26 @@ AutomationX TTS - Custom Exceptions & Error Handling
 """
 
 import functools
-import logging
 from typing import Callable, TypeVar, Any
 
 # Logging setup
 import os
+import atexit
 import logging
+import logging.handlers
+import queue
 from datetime import datetime
 
-# Logging setup
+try:
+    import gradio as _gr
+except ImportError:  # API-only kurulum (ör. Colab)
+    _gr = None
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+LOG_DATEFMT = "%Y-%m-%d %H:%M:%S"
+LOG_MAX_BYTES = 50_000_000
+LOG_BACKUP_COUNT = 5
+
 log_handlers = []
 log_type = os.getenv("LOG_TYPE", "console").lower()
 
@@ -28,17 +39,28 @@ if "file" in log_type or "both" in log_type:
     today = datetime.now().strftime("%Y-%m-%d")
     log_file = os.path.join(logs_dir, f"app_{today}.log")
     
-    log_handlers.append(logging.FileHandler(log_file, encoding='utf-8'))
+    log_handlers.append(logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8'
+    ))
 
 # Default fallback
 if not log_handlers:
     log_handlers.append(logging.StreamHandler())
 
+for handler in log_handlers:
+    handler.setFormatter(logging.Formatter(LOG_FORMAT, datefmt=LOG_DATEFMT))
+
+# Log çağrıları sadece kuyruğa yazar; disk/konsol I/O'su listener thread'inde yapılır
+log_queue = queue.Queue(-1)
+queue_handler = logging.handlers.QueueHandler(log_queue)
+queue_handler.setFormatter(logging.Formatter("%(message)s"))  # Asıl format handler'larda
+log_listener = logging.handlers.QueueListener(log_queue, *log_handlers, respect_handler_level=True)
+log_listener.start()
+atexit.register(log_listener.stop)
+
 logging.basicConfig(
     level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
-    handlers=log_handlers
+    handlers=[queue_handler]
 )
 logger = logging.getLogger("chatterbox")
 
@@ -93,7 +115,6 @@ def error_boundary(
         log_error: Hatayı logla
     """
     def decorator(func: Callable[..., T]) -> Callable[..., T]:
-        @functools.wraps(func)
         @functools.wraps(func)
         def wrapper(*args, **kwargs) -> T:
             try:
@@ -105,24 +126,20 @@ def error_boundary(
                 
                 # If reraise is requested (e.g. strict_operation), we must raise it
                 if reraise:
-                    try:
-                        import gradio as gr
+                    if _gr is not None:
                         # Raising gr.Error shows a toast in UI and usually suppresses server traceback
-                        raise gr.Error(str(e))
-                    except ImportError:
-                        # Fallback if gradio not available (e.g. API only)
-                        raise e
+                        raise _gr.Error(str(e))
+                    # Fallback if gradio not available (e.g. API only)
+                    raise e
                 return default_return
             except Exception as e:
                 # Unexpected errors
                 if log_error:
                     logger.error(f"[{func.__name__}] Unexpected error: {e}", exc_info=True)
                 if reraise:
-                    try:
-                         import gradio as gr
-                         raise gr.Error(f"Beklenmeyen hata: {str(e)}")
-                    except ImportError:
-                         raise TTSError(f"Beklenmeyen hata: {str(e)}") from e
+                    if _gr is not None:
+                        raise _gr.Error(f"Beklenmeyen hata: {str(e)}")
+                    raise TTSError(f"Beklenmeyen hata: {str(e)}") from e
                 return default_return
         return wrapper
     return decorator
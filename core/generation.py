@@ -0,0 +1,175 @@
+"""
+AutomationX TTS - Chunk Generation
+Metin parçalarından (chunk) ses üretimi için ortak döngü.
+"""
+
+import threading
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, List, Optional
+
+import torch
+
+from .exceptions import logger
+from .cache import model_cache, conditionals_cache, result_cache, content_hasher, file_digest
+
+BUILTIN_VOICE = "builtin"
+
+
+def _result_key(*parts: Any) -> bytes:
+    """Üretim parametrelerinden 128-bit cache key"""
+    return content_hasher("|".join(map(str, parts)).encode("utf-8")).digest()
+
+
+RETRY_SEED_STRIDE = 100  # Tekrar denemelerde seed kayması
+
+# UI, senkron /generate ve job worker aynı modeli kullanır
+_generation_lock = threading.Lock()
+
+
+@contextmanager
+def _isolated_rng():
+    """
+    Blok içindeki seed'lemeleri izole et, çıkışta global RNG durumunu geri yükle.
+    RNG durumu üretimin tamamı için bir kez kaydedilir (chunk başına değil).
+    """
+    devices = [torch.cuda.current_device()] if torch.cuda.is_available() else []
+    with torch.random.fork_rng(devices=devices):
+        yield
+
+
+def _apply_conditionals(tts: Any, audio_prompt_path: str, ref_hash: str, exaggeration: float) -> None:
+    """Referans sesin conditionals'ını cache'ten yükle, yoksa hesapla ve kaydet"""
+    conds = conditionals_cache.get(ref_hash)
+    if conds is None:
+        tts.prepare_conditionals(audio_prompt_path, exaggeration=exaggeration)
+        conditionals_cache.set(ref_hash, tts.conds)
+    else:
+        tts.conds = conds
+
+
+def generate_chunks(
+    tts: Any,
+    chunks: list,
+    language_id: str,
+    audio_prompt_path: Optional[str] = None,
+    ref_hash: Optional[str] = None,
+    exaggeration: float = 0.5,
+    cfg_weight: float = 0.5,
+    seed: int = 0,
+    cache_results: bool = True,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    max_attempts: int = 3,
+    log_prefix: str = "",
+    autocast_dtype: Optional[torch.dtype] = None,
+) -> List[torch.Tensor]:
+    """
+    Tüm chunk'lar için ses üret.
+
+    Referans ses koşullandırması (conditionals) istek başına bir kez hazırlanır
+    ve tüm chunk'lar tarafından paylaşılır; içerik hash'i ile cache'lendiği için
+    aynı referans ses sonraki isteklerde tekrar işlenmez. Hata veren chunk'lar
+    ilk geçişten sonra farklı seed ile tekrar denenir; sadece başarısız olanlar
+    yeniden üretilir. Tüm denemelerde başarısız olan chunk yerine 0.5 sn
+    sessizlik konur.
+
+    Aynı (metin, dil, ayarlar, seed, ses) için daha önce üretilmiş chunk'lar
+    result cache'ten alınır, model çalıştırılmaz.
+
+    Args:
+        tts: Yüklü ChatterboxMultilingualTTS modeli
+        chunks: Metin parçaları
+        language_id: Dil kodu
+        audio_prompt_path: Voice cloning için referans ses (opsiyonel)
+        ref_hash: Referans sesin içerik hash'i (yoksa dosyadan hesaplanır)
+        exaggeration: Duygu yoğunluğu
+        cfg_weight: Metin sadakati
+        seed: Temel seed (chunk i için seed + i)
+        cache_results: Sonuçları cache'le (rastgele seed'lerde anlamsız)
+        progress_callback: Her chunk öncesi (index, toplam) ile çağrılır
+        max_attempts: Chunk başına deneme sayısı
+        log_prefix: Log mesajlarının önüne eklenecek etiket
+        autocast_dtype: CUDA'da mixed precision tipi (None = FP32)
+
+    Returns:
+        Chunk sırasıyla audio tensor listesi
+    """
+    # Model paylaşımlı: tts.conds ve global RNG istekler arasında ortak olduğu
+    # için ses seçiminden chunk döngüsünün sonuna kadar üretim seri yapılır.
+    # Üretim süresince model kiralanır: idle watcher uzun işlerde modeli
+    # yarı yolda CPU'ya taşımaz veya atmaz
+    with _generation_lock, model_cache.lease(tts):
+        # Referans sesi bir kez işle, chunk'lar tts.conds üzerinden paylaşsın
+        if audio_prompt_path:
+            ref_hash = ref_hash or file_digest(audio_prompt_path)
+            _apply_conditionals(tts, audio_prompt_path, ref_hash, exaggeration)
+            voice = ref_hash
+        else:
+            # Önceki klonlama isteğinin sesi kalmasın
+            if conditionals_cache.builtin is not None:
+                tts.conds = conditionals_cache.builtin
+            voice = BUILTIN_VOICE
+        # Bu isteğin seçtiği ses; cache'e yazmadan önce hâlâ aktif olduğu doğrulanır
+        selected_conds = tts.conds
+
+        total = len(chunks)
+        chunk_seeds = range(seed, seed + total)
+        segments: List[Optional[torch.Tensor]] = [None] * total
+        keys: List[Optional[bytes]] = [None] * total
+        pending = []
+
+        for i, chunk in enumerate(chunks):
+            if cache_results:
+                keys[i] = _result_key(language_id, exaggeration, cfg_weight, chunk_seeds[i], chunk, voice)
+                segments[i] = result_cache.get(keys[i])
+            if segments[i] is None:
+                pending.append(i)
+
+        # Çıkış her durumda FP32'ye döner (merge/post-process FP32 bekler)
+        autocast = torch.autocast("cuda", dtype=autocast_dtype) if autocast_dtype else nullcontext()
+
+        # Chunk döngüsünde tekrar tekrar çözülen attribute'lar yerel isimlere alınır
+        generate = tts.generate
+        manual_seed = torch.manual_seed  # CUDA üreticilerini de seed'ler
+        cache_set = result_cache.set
+
+        # Autograd kaydı tutulmaz; .float() dönüşümü ve cache kopyaları da kapsanır
+        with _isolated_rng(), torch.inference_mode(), autocast:
+            for attempt in range(max_attempts):
+                failed = []
+                seed_offset = attempt * RETRY_SEED_STRIDE
+                for i in pending:
+                    if attempt == 0 and progress_callback is not None:
+                        progress_callback(i, total)
+
+                    manual_seed(chunk_seeds[i] + seed_offset)
+                    try:
+                        segments[i] = generate(
+                            chunks[i],
+                            language_id=language_id,
+                            audio_prompt_path=None,
+                            exaggeration=exaggeration,
+                            cfg_weight=cfg_weight,
+                        ).float()
+                        # Cache sadece üretim kilidi altında ve doğru sesle yazılır;
+                        # yanlış sesli chunk kalıcı cache girdisine dönüşmesin
+                        if keys[i] is not None and tts.conds is selected_conds:
+                            cache_set(keys[i], segments[i].cpu())
+                    except RuntimeError as e:
+                        logger.warning(f"{log_prefix}Chunk {i+1}/{total} failed (attempt {attempt+1}): {e}")
+                        failed.append(i)
+
+                pending = failed
+                if not pending:
+                    break
+
+    if pending:
+        # Yer tutucu olarak 0.5 sn sessizlik: tek tensor, tüm başarısız chunk'lar
+        # paylaşır (salt okunur). Merge'de kopya olmasın diye diğer segmentlerle
+        # aynı cihazda oluşturulur (Chatterbox çıktısı CPU'dadır).
+        produced = next((seg for seg in segments if seg is not None), None)
+        silence = torch.zeros(1, int(tts.sr * 0.5), device=produced.device if produced is not None else "cpu")
+        for i in pending:
+            logger.error(f"{log_prefix}Skipping chunk after {max_attempts} failures: {chunks[i][:20]}...")
+            segments[i] = silence
+
+    return segments
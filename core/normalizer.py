@@ -4,6 +4,7 @@ Sayıları, tarihleri, saatleri ve özel formatları Türkçe metne çevirir.
 """
 
 import re
+from functools import lru_cache
 from typing import Optional
 
 # ===================================================================
@@ -12,12 +13,15 @@ from typing import Optional
 
 ONES = ["", "bir", "iki", "üç", "dört", "beş", "altı", "yedi", "sekiz", "dokuz"]
 TENS = ["", "on", "yirmi", "otuz", "kırk", "elli", "altmış", "yetmiş", "seksen", "doksan"]
+# Ondalık kısım rakam rakam okunur: "3,05" -> "üç virgül sıfır beş"
+_DIGIT_WORDS = ("sıfır", "bir", "iki", "üç", "dört", "beş", "altı", "yedi", "sekiz", "dokuz")
+_DIGIT_WORD_BY_CHAR = {str(i): word for i, word in enumerate(_DIGIT_WORDS)}
+HUNDRED = "yüz"
 SCALES = [
     (1_000_000_000_000, "trilyon"),
     (1_000_000_000, "milyar"),
     (1_000_000, "milyon"),
     (1_000, "bin"),
-    (100, "yüz"),
 ]
 
 ORDINALS = {
@@ -26,6 +30,26 @@ ORDINALS = {
 }
 
 
+def _under_1000_to_turkish(n: int) -> str:
+    """0-999 arası sayıyı Türkçe metne çevir (0 -> boş)."""
+    hundreds, rest = divmod(n, 100)
+    tens, ones = divmod(rest, 10)
+    result = []
+    if hundreds:
+        if hundreds > 1:
+            result.append(ONES[hundreds])  # "bir yüz" değil "yüz"
+        result.append(HUNDRED)
+    if tens:
+        result.append(TENS[tens])
+    if ones:
+        result.append(ONES[ones])
+    return " ".join(result)
+
+
+# 0-999 için hazır tablo: her 3 haneli grup tek bir lookup
+_TR_UNDER_1000 = tuple(_under_1000_to_turkish(i) for i in range(1000))
+
+
 def number_to_turkish(n: int) -> str:
     """Sayıyı Türkçe metne çevir."""
     if n == 0:
@@ -34,36 +58,27 @@ def number_to_turkish(n: int) -> str:
     if n < 0:
         return "eksi " + number_to_turkish(-n)
     
+    if n < 1000:
+        return _TR_UNDER_1000[n]
+    
     result = []
     
     for scale, name in SCALES:
-        if n >= scale:
-            count = n // scale
-            n %= scale
-            
-            if scale == 1000 and count == 1:
-                result.append(name)  # "bir bin" değil "bin"
-            elif scale == 100 and count == 1:
-                result.append(name)  # "bir yüz" değil "yüz"
-            else:
-                if count >= 100:
-                    result.append(number_to_turkish(count))
-                elif count >= 10:
-                    result.append(TENS[count // 10])
-                    if count % 10:
-                        result.append(ONES[count % 10])
-                else:
-                    result.append(ONES[count])
-                result.append(name)
-    
-    if n >= 10:
-        result.append(TENS[n // 10])
-        n %= 10
-    
-    if n > 0:
-        result.append(ONES[n])
-    
-    return " ".join(filter(None, result))
+        count, n = divmod(n, scale)
+        if not count:
+            continue
+        
+        if scale == 1000 and count == 1:
+            result.append(name)  # "bir bin" değil "bin"
+        else:
+            # Sadece trilyonun üstünde grup 999'u aşar
+            result.append(_TR_UNDER_1000[count] if count < 1000 else number_to_turkish(count))
+            result.append(name)
+    
+    if n:
+        result.append(_TR_UNDER_1000[n])
+    
+    return " ".join(result)
 
 
 def decimal_to_turkish(num_str: str) -> str:
@@ -72,7 +87,8 @@ def decimal_to_turkish(num_str: str) -> str:
         num_str = num_str.replace(",", ".")
         parts = num_str.split(".")
         integer_part = number_to_turkish(int(parts[0]))
-        decimal_part = " ".join(ONES[int(d)] if d != "0" else "sıfır" for d in parts[1])
+        # ASCII dışı Unicode rakamlar (\d eşleşir) için int() yedeği
+        decimal_part = " ".join(_DIGIT_WORD_BY_CHAR.get(d) or _DIGIT_WORDS[int(d)] for d in parts[1])
         return f"{integer_part} virgül {decimal_part}"
     return number_to_turkish(int(num_str))
 
@@ -81,111 +97,141 @@ def decimal_to_turkish(num_str: str) -> str:
 # NORMALIZER PATTERNS
 # ===================================================================
 
+# Modül yüklenirken bir kez derlenir
+_PCT_RE = re.compile(r"%(\d+(?:[.,]\d+)?)")
+_CURRENCY_RES = [
+    (re.compile(pattern, re.IGNORECASE), unit)
+    for pattern, unit in (
+        (r"(\d+(?:[.,]\d+)?)\s*₺", "lira"),
+        (r"(\d+(?:[.,]\d+)?)\s*TL", "lira"),
+        (r"\$(\d+(?:[.,]\d+)?)", "dolar"),
+        (r"€(\d+(?:[.,]\d+)?)", "euro"),
+        (r"£(\d+(?:[.,]\d+)?)", "sterlin"),
+    )
+]
+_TIME_RE = re.compile(r"(\d{1,2}):(\d{2})")
+_DATE_RE = re.compile(r"(\d{1,2})[./](\d{1,2})[./](\d{4})")  # DD.MM.YYYY veya DD/MM/YYYY
+_YEAR_RE = re.compile(r"\b(19|20)\d{2}\b")  # Tek başına 4 haneli yıllar (kelime sınırında)
+_ORD_RE = re.compile(r"(\d+)\.")
+_NUM_RE = re.compile(r"\b\d+(?:[.,]\d+)?\b")  # Ondalık veya tam sayı
+_WS_RE = re.compile(r"\s+")
+
+MONTHS = {
+    1: "ocak", 2: "şubat", 3: "mart", 4: "nisan",
+    5: "mayıs", 6: "haziran", 7: "temmuz", 8: "ağustos",
+    9: "eylül", 10: "ekim", 11: "kasım", 12: "aralık"
+}
+
+
+def _replace_percentage(m: re.Match) -> str:
+    return f"yüzde {decimal_to_turkish(m.group(1))}"
+
+
+def _currency_replacer(unit: str):
+    def replace(m: re.Match) -> str:
+        return f"{decimal_to_turkish(m.group(1))} {unit}"
+    return replace
+
+
+def _replace_time(m: re.Match) -> str:
+    hour = int(m.group(1))
+    minute = int(m.group(2))
+    hour_str = number_to_turkish(hour)
+    if minute == 0:
+        return hour_str
+    minute_str = number_to_turkish(minute)
+    return f"{hour_str} {minute_str}"
+
+
+def _replace_date(m: re.Match) -> str:
+    day = int(m.group(1))
+    month = int(m.group(2))
+    year = int(m.group(3))
+    
+    day_str = number_to_turkish(day)
+    # Geçersiz ay da sayı olarak okunur
+    month_str = MONTHS.get(month) or number_to_turkish(month)
+    year_str = number_to_turkish(year)
+    
+    return f"{day_str} {month_str} {year_str}"
+
+
+def _replace_year(m: re.Match) -> str:
+    year = int(m.group(0))
+    if 1900 <= year <= 2100:
+        return number_to_turkish(year)
+    return m.group(0)
+
+
+def _replace_ordinal(m: re.Match) -> str:
+    num = int(m.group(1))
+    if num in ORDINALS:
+        return ORDINALS[num]
+    return f"{number_to_turkish(num)}inci"  # Basitleştirilmiş
+
+
+def _replace_number(m: re.Match) -> str:
+    num_str = m.group(0)
+    try:
+        if "." in num_str or "," in num_str:
+            return decimal_to_turkish(num_str)
+        return number_to_turkish(int(num_str))
+    except:
+        return num_str
+
+
 def normalize_percentages(text: str) -> str:
     """Yüzdeleri çevir: %50 -> yüzde elli"""
-    def replace(m):
-        num = m.group(1)
-        return f"yüzde {decimal_to_turkish(num)}"
-    return re.sub(r"%(\d+(?:[.,]\d+)?)", replace, text)
+    return _PCT_RE.sub(_replace_percentage, text)
+
+
+_CURRENCY_RULES = [(pattern, _currency_replacer(unit)) for pattern, unit in _CURRENCY_RES]
 
 
 def normalize_currency(text: str) -> str:
     """Para birimlerini çevir: 100₺ -> yüz lira, $50 -> elli dolar"""
-    patterns = [
-        (r"(\d+(?:[.,]\d+)?)\s*₺", lambda m: f"{decimal_to_turkish(m.group(1))} lira"),
-        (r"(\d+(?:[.,]\d+)?)\s*TL", lambda m: f"{decimal_to_turkish(m.group(1))} lira"),
-        (r"\$(\d+(?:[.,]\d+)?)", lambda m: f"{decimal_to_turkish(m.group(1))} dolar"),
-        (r"€(\d+(?:[.,]\d+)?)", lambda m: f"{decimal_to_turkish(m.group(1))} euro"),
-        (r"£(\d+(?:[.,]\d+)?)", lambda m: f"{decimal_to_turkish(m.group(1))} sterlin"),
-    ]
-    for pattern, repl in patterns:
-        text = re.sub(pattern, repl, text, flags=re.IGNORECASE)
+    for pattern, replace in _CURRENCY_RULES:
+        text = pattern.sub(replace, text)
     return text
 
 
 def normalize_time(text: str) -> str:
     """Saatleri çevir: 15:30 -> on beş otuz"""
-    def replace(m):
-        hour = int(m.group(1))
-        minute = int(m.group(2))
-        hour_str = number_to_turkish(hour)
-        if minute == 0:
-            return hour_str
-        minute_str = number_to_turkish(minute)
-        return f"{hour_str} {minute_str}"
-    return re.sub(r"(\d{1,2}):(\d{2})", replace, text)
+    return _TIME_RE.sub(_replace_time, text)
 
 
 def normalize_dates(text: str) -> str:
     """Tarihleri çevir: 31.12.2024 -> otuz bir aralık iki bin yirmi dört"""
-    months = {
-        1: "ocak", 2: "şubat", 3: "mart", 4: "nisan",
-        5: "mayıs", 6: "haziran", 7: "temmuz", 8: "ağustos",
-        9: "eylül", 10: "ekim", 11: "kasım", 12: "aralık"
-    }
-    
-    def replace(m):
-        day = int(m.group(1))
-        month = int(m.group(2))
-        year = int(m.group(3))
-        
-        day_str = number_to_turkish(day)
-        month_str = months.get(month, str(month))
-        year_str = number_to_turkish(year)
-        
-        return f"{day_str} {month_str} {year_str}"
-    
-    # DD.MM.YYYY veya DD/MM/YYYY
-    text = re.sub(r"(\d{1,2})[./](\d{1,2})[./](\d{4})", replace, text)
-    return text
+    return _DATE_RE.sub(_replace_date, text)
 
 
 def normalize_years(text: str) -> str:
     """Yılları çevir: 2026 -> iki bin yirmi altı (bağlamda)"""
-    def replace(m):
-        year = int(m.group(0))
-        if 1900 <= year <= 2100:
-            return number_to_turkish(year)
-        return m.group(0)
-    
-    # Tek başına 4 haneli yıllar (kelime sınırında)
-    return re.sub(r"\b(19|20)\d{2}\b", replace, text)
+    return _YEAR_RE.sub(_replace_year, text)
 
 
 def normalize_ordinals(text: str) -> str:
     """Sıra sayılarını çevir: 1. -> birinci, 2. -> ikinci"""
-    def replace(m):
-        num = int(m.group(1))
-        if num in ORDINALS:
-            return ORDINALS[num]
-        return f"{number_to_turkish(num)}inci"  # Basitleştirilmiş
-    
-    return re.sub(r"(\d+)\.", replace, text)
+    return _ORD_RE.sub(_replace_ordinal, text)
 
 
 def normalize_standalone_numbers(text: str) -> str:
     """Kalan sayıları çevir"""
-    def replace(m):
-        num_str = m.group(0)
-        try:
-            if "." in num_str or "," in num_str:
-                return decimal_to_turkish(num_str)
-            return number_to_turkish(int(num_str))
-        except:
-            return num_str
-    
-    # Ondalık veya tam sayı
-    return re.sub(r"\b\d+(?:[.,]\d+)?\b", replace, text)
+    return _NUM_RE.sub(_replace_number, text)
 
 
 # ===================================================================
 # MAIN NORMALIZER
 # ===================================================================
 
+@lru_cache(maxsize=1024)
 def normalize_text(text: str) -> str:
     """
     Metni TTS için normalize et.
-    Sıra önemli - önce özel formatlar, sonra genel sayılar.
+    Sıra önemli - önce özel formatlar, sonra genel sayılar. Her kural bir
+    önceki kuralın çıktısı üzerinde çalışır (ör. "10:30 TL" önce para olarak
+    okunur), bu yüzden geçişler birleştirilmez; desenler önceden derlenmiştir.
+    Sonuç deterministik olduğu için aynı metin tekrar işlenmez (lru_cache).
     """
     # 1. Yüzdeler
     text = normalize_percentages(text)
@@ -209,6 +255,6 @@ def normalize_text(text: str) -> str:
     text = normalize_standalone_numbers(text)
     
     # Fazla boşlukları temizle
-    text = re.sub(r"\s+", " ", text).strip()
+    text = _WS_RE.sub(" ", text).strip()
     
     return text
@@ -3,37 +3,85 @@ AutomationX TTS - Application State Management (Singleton)
 """
 
 import os
+import functools
+import threading
 import torch
+from contextlib import contextmanager
 from typing import Optional, Any
-from dotenv import load_dotenv
 
 from .exceptions import ModelLoadError, logger
-from .cache import model_cache
+from .cache import model_cache, conditionals_cache
+from .audio_processor import AudioProcessor
 from . import database
 
 
-class AppState:
+AUTOCAST_DTYPES = {"bf16": torch.bfloat16, "fp16": torch.float16}
+
+
+def _as_bool(value: str) -> bool:
+    return str(value).lower() == "true"
+
+
+def _as_flag(value: str) -> bool:
+    return str(value) == "1"
+
+
+# (değişken, dönüşüm, varsayılan) - varsayılanlar .env ile uyumlu
+_ENV_SPEC = (
+    ("PORT", int, 7860),
+    ("HIGHPASS_FREQ", int, 80),
+    ("LOWPASS_FREQ", int, 10000),
+    ("NOISE_GATE_THRESHOLD", int, -45),
+    ("NORMALIZE_AUDIO", _as_bool, "True"),
+    ("TTS_COMPILE", _as_flag, "0"),
+    ("TTS_AUTOCAST_DTYPE", str.lower, "off"),
+    ("TTS_MMAP", _as_flag, "0"),
+    ("MAX_CHUNK_CHARS", int, 200),
+    ("SILENCE_BETWEEN_CHUNKS_MS", int, 150),
+    ("FADE_MS", int, 30),
+)
+
+
+@contextmanager
+def _torch_load_overrides(**overrides):
     """
-    Singleton Application State.
-    Tüm global state'i tek noktadan yönetir.
+    Blok içinde torch.load çağrılarına verilen argümanları zorla.
+    mmap desteklemeyen (eski formatlı) checkpoint'ler mmap'siz yüklenir.
     """
-    _instance: Optional["AppState"] = None
+    original_load = torch.load
     
-    def __new__(cls) -> "AppState":
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance._initialized = False
-        return cls._instance
+    def load(*args, **kwargs):
+        kwargs.update(overrides)
+        try:
+            return original_load(*args, **kwargs)
+        except RuntimeError:
+            if not kwargs.pop("mmap", False):
+                raise
+            return original_load(*args, **kwargs)
+    
+    torch.load = load
+    try:
+        yield
+    finally:
+        torch.load = original_load
+
+
+class AppState:
+    """
+    Application State.
+    Tüm global state'i tek noktadan yönetir; tek örneği get_state() verir.
+    """
     
     def __init__(self):
-        if self._initialized:
-            return
+        # Paths
+        self.base_dir = os.path.dirname(os.path.dirname(__file__))
+        self.outputs_dir = os.path.join(self.base_dir, "outputs")
         
-        # Load environment
-        load_dotenv()
+        # .env, core paketi import edilirken yüklenir (core/env.py)
+        env = {name: cast(os.environ.get(name, default)) for name, cast, default in _ENV_SPEC}
         
         # Config - General
-        self.port = int(os.getenv("PORT", 7860))
+        self.port = env["PORT"]
         
         # Device detection: CUDA (NVIDIA) > MPS (Apple Silicon) > CPU
         if torch.cuda.is_available():
@@ -43,27 +91,39 @@ class AppState:
         else:
             self.device = "cpu"
         
-        # Config - Audio Processing (varsayılanlar .env ile uyumlu)
+        # Config - Audio Processing
         self.audio_config = {
-            "highpass_freq": int(os.getenv("HIGHPASS_FREQ", 80)),
-            "lowpass_freq": int(os.getenv("LOWPASS_FREQ", 10000)),
-            "noise_gate_threshold": int(os.getenv("NOISE_GATE_THRESHOLD", -45)),
-            "normalize_audio": os.getenv("NORMALIZE_AUDIO", "True").lower() == "true",
+            "highpass_freq": env["HIGHPASS_FREQ"],
+            "lowpass_freq": env["LOWPASS_FREQ"],
+            "noise_gate_threshold": env["NOISE_GATE_THRESHOLD"],
+            "normalize_audio": env["NORMALIZE_AUDIO"],
         }
+        # Filtre katsayıları ve eşikler bir kez hesaplanır, tüm isteklerde paylaşılır
+        self.audio_processor = AudioProcessor(self.audio_config)
         
-        # Config - Chunking
-        self.max_chunk_chars = int(os.getenv("MAX_CHUNK_CHARS", 200))
-        self.silence_between_chunks_ms = int(os.getenv("SILENCE_BETWEEN_CHUNKS_MS", 150))
-        self.fade_ms = int(os.getenv("FADE_MS", 30))
+        # Config - Inference
+        self.compile_model = env["TTS_COMPILE"]
+        # Sadece CUDA'da geçerli: bf16 (Ampere+) veya fp16 (eski GPU'lar)
+        self.autocast_dtype = AUTOCAST_DTYPES.get(env["TTS_AUTOCAST_DTYPE"]) if self.device == "cuda" else None
+        # Checkpoint'leri mmap ile oku (dosyanın ayrı bir RAM kopyası tutulmaz)
+        self.mmap_weights = env["TTS_MMAP"]
         
-        # Paths
-        self.base_dir = os.path.dirname(os.path.dirname(__file__))
-        self.outputs_dir = os.path.join(self.base_dir, "outputs")
+        # Config - Chunking
+        self.max_chunk_chars = env["MAX_CHUNK_CHARS"]
+        self.silence_between_chunks_ms = env["SILENCE_BETWEEN_CHUNKS_MS"]
+        self.fade_ms = env["FADE_MS"]
         
         # Initialize database
         self.db_path = database.init_database(self.outputs_dir)
         
-        self._initialized = True
+        # Preload thread'i ile ilk istek modeli aynı anda yüklemesin
+        self._model_lock = threading.Lock()
+        
+        # Geçmiş sorgusu cache'i - yeni kayıtta geçersiz olur
+        self._history_cache: list = []
+        self._history_limit = 0
+        self._history_dirty = True
+        
         logger.info(f"AppState initialized. Device: {self.device}")
     
     # ===================================================================
@@ -73,9 +133,24 @@ class AppState:
     @property
     def tts_model(self) -> Any:
         """Lazy load TTS model"""
-        if not model_cache.has("tts"):
-            model_cache.set("tts", self._load_tts_model())
-        return model_cache.get("tts")
+        model = model_cache.get("tts")
+        if model is None:
+            with self._model_lock:
+                model = model_cache.get("tts")
+                if model is None:
+                    model = self._load_tts_model()
+                    model_cache.set("tts", model)
+        return model
+    
+    def preload(self) -> None:
+        """Modeli arka planda yükle; ilk istek sıcak cache'e denk gelir"""
+        def load():
+            try:
+                self.tts_model
+            except ModelLoadError:
+                pass  # _load_tts_model logladı, ilk istek tekrar dener
+        
+        threading.Thread(target=load, name="tts-preload", daemon=True).start()
     
     def _load_tts_model(self) -> Any:
         """TTS modelini yükle"""
@@ -84,16 +159,20 @@ class AppState:
             
             logger.info("Loading TTS model...")
             
+            overrides = {}
             if self.device == "cpu":
-                original_load = torch.load
-                torch.load = lambda *args, **kwargs: original_load(
-                    *args, **{**kwargs, "map_location": torch.device("cpu")}
-                )
+                overrides["map_location"] = torch.device("cpu")
+            if self.mmap_weights:
+                overrides.update(mmap=True, weights_only=True)
             
-            model = ChatterboxMultilingualTTS.from_pretrained(device=self.device)
+            with _torch_load_overrides(**overrides):
+                model = ChatterboxMultilingualTTS.from_pretrained(device=self.device)
             
-            if self.device == "cpu":
-                torch.load = original_load
+            if self.compile_model and self.device == "cuda":
+                self._compile_model(model)
+            
+            # Referanssız istekler için yerleşik sesi sakla
+            conditionals_cache.set_builtin(model.conds)
             
             logger.info("TTS model loaded successfully.")
             return model
@@ -101,24 +180,48 @@ class AppState:
             logger.error(f"Failed to load TTS model: {e}")
             raise ModelLoadError(f"TTS model yüklenemedi: {e}")
     
+    def _compile_model(self, model: Any) -> None:
+        """
+        T3 transformer forward'unu derle (TTS_COMPILE=1).
+        CUDA graph kullanılmaz (mode="default"): KV cache ve dizi uzunluğu her
+        decode adımında büyüdüğü için graph sürekli yeniden kaydedilirdi.
+        """
+        tfmr = getattr(getattr(model, "t3", None), "tfmr", None)
+        if tfmr is None:
+            logger.warning("TTS_COMPILE: T3 transformer not found, skipping compile.")
+            return
+        
+        tfmr.forward = torch.compile(tfmr.forward, mode="default", fullgraph=False)
+        logger.info("T3 transformer compiled (mode=default).")
+    
 
     # DATABASE OPERATIONS (Delegated)
     # ===================================================================
     
     def save_to_history(self, entry: dict) -> bool:
         """Geçmişe kaydet"""
-        return database.add_entry(self.db_path, entry)
+        saved = database.add_entry(self.db_path, entry)
+        # Bayrak insert commit edildikten sonra kirletilir; arada yapılan bir sorgu
+        # kaydı göremese bile sonraki load_history tekrar sorgular
+        self._history_dirty = True
+        return saved
     
     def load_history(self, limit: int = 50) -> list:
-        """Geçmişi yükle"""
-        return database.get_entries(self.db_path, limit)
+        """Geçmişi yükle (değişiklik yoksa cache'ten)"""
+        if self._history_dirty or limit > self._history_limit:
+            # Bayrak sorgudan önce indirilir; sorgu sırasında gelen kayıt tekrar kirletir
+            self._history_dirty = False
+            self._history_cache = database.get_entries(self.db_path, limit)
+            self._history_limit = limit
+        return self._history_cache[:limit]
     
     def get_history_entry(self, filename: str) -> Optional[dict]:
         """Filename ile kayıt bul"""
         return database.get_by_filename(self.db_path, filename)
 
 
-# Global state instance - import edildiğinde oluşur
+# Global state instance - ilk çağrıda oluşur, sonra cache'ten döner
+@functools.cache
 def get_state() -> AppState:
     """Get or create AppState singleton"""
     return AppState()
@@ -3,52 +3,67 @@ AutomationX TTS - Utilities
 Shared utility functions for text and audio processing.
 """
 
+import math
 import re
+from functools import lru_cache
+from typing import BinaryIO, Union
+
+import soundfile as sf
 import torch
 
-def split_into_sentences(text: str, max_chars: int = 200) -> list:
+# Cümle sonu işaretleri ve uzun cümleler için ikincil kesme noktaları
+_SENT_RE = re.compile(r'(?<=[.!?])\s+')
+_SUB_RE = re.compile(r'(?<=[,;:])\s+')
+
+
+@lru_cache(maxsize=1024)
+def split_into_sentences(text: str, max_chars: int = 200) -> tuple:
     """
     Metni cümlelere böl. Çok uzun cümleler varsa noktalama yerlerinden kes.
+    Sonuç cache'lenir ve paylaşıldığı için değiştirilemez tuple döner.
     """
-    # Cümle sonu işaretleri
-    sentence_endings = re.compile(r'(?<=[.!?])\s+')
-    sentences = sentence_endings.split(text.strip())
-    
     chunks = []
-    current_chunk = ""
+    parts = []   # Mevcut chunk'ın parçaları (flush'ta birleştirilir)
+    cur_len = 0  # len(" ".join(parts))
     
-    for sentence in sentences:
+    for sentence in _SENT_RE.split(text.strip()):
         sentence = sentence.strip()
         if not sentence:
             continue
         
         # Cümle çok uzunsa, virgül/noktalı virgül yerinden böl
-        if len(sentence) > max_chars:
-            sub_parts = re.split(r'(?<=[,;:])\s+', sentence)
-            for part in sub_parts:
-                if len(current_chunk) + len(part) + 1 <= max_chars:
-                    current_chunk = f"{current_chunk} {part}".strip()
-                else:
-                    if current_chunk:
-                        chunks.append(current_chunk)
-                    current_chunk = part
-        else:
-            if len(current_chunk) + len(sentence) + 1 <= max_chars:
-                current_chunk = f"{current_chunk} {sentence}".strip()
+        pieces = _SUB_RE.split(sentence) if len(sentence) > max_chars else (sentence,)
+        for piece in pieces:
+            if cur_len + len(piece) + 1 <= max_chars:
+                cur_len += len(piece) + 1 if parts else len(piece)
+                parts.append(piece)
             else:
-                if current_chunk:
-                    chunks.append(current_chunk)
-                current_chunk = sentence
+                if parts:
+                    chunks.append(" ".join(parts))
+                parts = [piece]
+                cur_len = len(piece)
     
-    if current_chunk:
-        chunks.append(current_chunk)
+    if parts:
+        chunks.append(" ".join(parts))
     
-    return chunks if chunks else [text]
+    return tuple(chunks) if chunks else (text,)
+
+
+@lru_cache(maxsize=8)
+def _fade_pair(fade_samples: int, device: torch.device, dtype: torch.dtype) -> tuple:
+    """
+    Equal-power (cos/sin) fade eğrileri: (fade_out, fade_in).
+    Kesişimde toplam güç sabit kalır (lineer fade'deki 3 dB çukur olmaz).
+    Eğriler sadece okunur; cache'lendiği için yerinde değiştirilmemeli.
+    """
+    t = torch.linspace(0.0, math.pi / 2, fade_samples, device=device, dtype=dtype)
+    return torch.cos(t), torch.sin(t)
 
 
 def merge_audio_with_crossfade(segments: list, sample_rate: int, 
                                 silence_ms: int = 150, 
-                                fade_ms: int = 30) -> torch.Tensor:
+                                fade_ms: int = 30,
+                                release: bool = False) -> torch.Tensor:
     """
     Audio segmentlerini crossfade ve sessizlik ile birleştir.
     
@@ -57,6 +72,8 @@ def merge_audio_with_crossfade(segments: list, sample_rate: int,
         sample_rate: Örnekleme hızı
         silence_ms: Segmentler arası sessizlik (ms)
         fade_ms: Fade in/out süresi (ms)
+        release: Kopyalanan segmentin listedeki referansını bırak (None yap).
+            Liste çağıranın tek kopyasıysa tepe bellek ~2x yerine ~1x olur.
     """
     if len(segments) == 1:
         return segments[0]
@@ -64,26 +81,74 @@ def merge_audio_with_crossfade(segments: list, sample_rate: int,
     silence_samples = int(sample_rate * silence_ms / 1000)
     fade_samples = int(sample_rate * fade_ms / 1000)
     
+    # Tüm işlemler segmentlerin cihazında yapılır (GPU'da CPU'ya gidip gelmez)
+    device, dtype = segments[0].device, segments[0].dtype
+    
     # Fade curves
-    fade_out = torch.linspace(1.0, 0.0, fade_samples)
-    fade_in = torch.linspace(0.0, 1.0, fade_samples)
+    fade_out, fade_in = _fade_pair(fade_samples, device, dtype)
+    
+    # silence_ms == 0 ise gerçek crossfade (overlap-add): komşu segmentlerin
+    # fade bölgeleri üst üste toplanır, araya boşluk girmez. Fade'in iki ucu
+    # çakışmasın diye sadece 2 * fade'den uzun segmentler örtüştürülür.
+    crossfade = silence_samples == 0 and fade_samples > 0
+    overlaps = [0] + [
+        fade_samples if crossfade and min(a.shape[1], b.shape[1]) > 2 * fade_samples else 0
+        for a, b in zip(segments, segments[1:])
+    ]
     
-    processed = []
+    # Çıkış tek seferde sıfırlı ayrılır, segmentler doğrudan yerine yazılır;
+    # aradaki sessizlik zaten sıfır olduğu için ayrıca yazılmaz
+    total = (sum(seg.shape[1] for seg in segments) + silence_samples * (len(segments) - 1)
+             - sum(overlaps))
+    out = torch.zeros(1, total, dtype=dtype, device=device)
+    
+    # Kaynak segmentler değiştirilmez (clone yok); fade'ler hedef dilimde yerinde uygulanır
+    row = out[0]
+    offset = 0
     for i, seg in enumerate(segments):
-        seg = seg.clone()
-        
-        # Fade out (son kısım) - ilk segment hariç hepsine uygula
-        if seg.shape[1] > fade_samples:
-            seg[0, -fade_samples:] *= fade_out
+        n = seg.shape[1]
+        ov = overlaps[i]
+        start = offset - ov
+        end = start + n
         
-        # Fade in (baş kısım) - son segment hariç hepsine uygula  
-        if i > 0 and seg.shape[1] > fade_samples:
-            seg[0, :fade_samples] *= fade_in
+        if ov:
+            # Önceki segmentin fade-out'lu kuyruğuna fade-in'li başı ekle
+            row[start:start + ov].add_(seg[0, :ov] * fade_in)
+            row[start + ov:end].copy_(seg[0, ov:])
+        else:
+            row[start:end].copy_(seg[0])
+            # Fade in (baş kısım) - ilk segment hariç
+            if i > 0 and n > fade_samples > 0:
+                row[start:start + fade_samples].mul_(fade_in)
         
-        processed.append(seg)
+        # Fade out (son kısım)
+        if n > fade_samples > 0:
+            row[end - fade_samples:end].mul_(fade_out)
+        offset = end + silence_samples
         
-        # Segmentler arası sessizlik ekle (son segment hariç)
-        if i < len(segments) - 1:
-            processed.append(torch.zeros(1, silence_samples))
+        if release:
+            segments[i] = None
     
-    return torch.cat(processed, dim=1)
+    return out
+
+
+def to_host(wav: torch.Tensor) -> torch.Tensor:
+    """
+    Tensor'ü CPU'ya al. CUDA'dan kopya pinned buffer'a DMA ile yapılır
+    (pageable bellek üzerinden ara kopya olmaz); CPU tensor aynen döner.
+    """
+    if wav.device.type != "cuda":
+        return wav.cpu()
+    host = torch.empty(wav.shape, dtype=wav.dtype, pin_memory=True)
+    host.copy_(wav, non_blocking=True)
+    torch.cuda.current_stream(wav.device).synchronize()
+    return host
+
+
+def write_wav(target: Union[str, BinaryIO], wav: torch.Tensor, sample_rate: int) -> None:
+    """
+    Audio tensor'ü 16-bit PCM WAV olarak yaz (dosya yolu veya file-like).
+    [kanal, örnek] tensor tek bir libsndfile çağrısıyla yazılır.
+    """
+    data = to_host(wav.detach().clamp(-1.0, 1.0)).numpy().T
+    sf.write(target, data, sample_rate, subtype="PCM_16", format="WAV")
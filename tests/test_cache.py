@@ -0,0 +1,137 @@
+"""
+ModelCache idle/lazy cleanup davranışı
+"""
+
+import threading
+import time
+import unittest
+from collections import OrderedDict
+from unittest import mock
+
+from core import cache
+from core.cache import model_cache
+
+
+class FakeModel:
+    device = "cuda"
+
+
+class ModelCacheGetTest(unittest.TestCase):
+    def setUp(self):
+        self.moves = []
+
+        def move(model, device, non_blocking=False):
+            self.moves.append(device)
+            model.device = device
+            return model
+
+        patches = [
+            mock.patch.object(cache, "_move_model", move),
+            mock.patch.object(cache, "_pin_model", lambda model: None),
+            mock.patch.object(cache, "_restore_model", lambda model, device: move(model, device)),
+            mock.patch.object(model_cache, "_models", OrderedDict()),
+            mock.patch.object(model_cache, "_offloaded", {}),
+            mock.patch.object(model_cache, "_counters", {}),
+            mock.patch.object(model_cache, "_leases", {}),
+            mock.patch.object(model_cache, "_moving", set()),
+            mock.patch.object(model_cache, "_watcher_enabled", False),
+            mock.patch.object(model_cache, "_timeout_seconds", 60),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def _expire(self, key):
+        model, _ = model_cache._models[key]
+        model_cache._models[key] = (model, time.time() - 3600)
+
+    def test_get_expired_key_is_not_offloaded_and_restored(self):
+        model = FakeModel()
+        with mock.patch.object(model_cache, "_offload_enabled", True):
+            model_cache.set("tts", model)
+            self._expire("tts")
+
+            self.assertIs(model_cache.get("tts"), model)
+            self.assertEqual(self.moves, [])
+            self.assertNotIn("tts", model_cache._offloaded)
+
+    def test_get_expired_key_is_not_dropped(self):
+        model = FakeModel()
+        with mock.patch.object(model_cache, "_offload_enabled", False), \
+                mock.patch.object(model_cache, "clear") as clear:
+            model_cache.set("tts", model)
+            self._expire("tts")
+
+            self.assertIs(model_cache.get("tts"), model)
+            clear.assert_not_called()
+
+    def test_get_still_cleans_up_other_expired_keys(self):
+        with mock.patch.object(model_cache, "_offload_enabled", False), \
+                mock.patch.object(model_cache, "_max_models", 2), \
+                mock.patch.object(model_cache, "clear") as clear:
+            model_cache.set("old", FakeModel())
+            model_cache.set("tts", FakeModel())
+            self._expire("old")
+            self._expire("tts")
+
+            model_cache.get("tts")
+            clear.assert_called_once_with("old", idle_before=mock.ANY)
+
+
+class ModelCacheOffloadTest(unittest.TestCase):
+    def setUp(self):
+        self.moves = []
+        self.release = threading.Event()
+        self.started = threading.Event()
+
+        def move(model, device, non_blocking=False):
+            if device == "cpu":
+                self.started.set()
+                self.release.wait(5)  # Büyük modelin yavaş taşınmasını taklit et
+            self.moves.append(device)
+            model.device = device
+            return model
+
+        patches = [
+            mock.patch.object(cache, "_move_model", move),
+            mock.patch.object(cache, "_pin_model", lambda model: None),
+            mock.patch.object(cache, "_restore_model", lambda model, device: move(model, device)),
+            mock.patch.object(model_cache, "_models", OrderedDict()),
+            mock.patch.object(model_cache, "_offloaded", {}),
+            mock.patch.object(model_cache, "_counters", {}),
+            mock.patch.object(model_cache, "_leases", {}),
+            mock.patch.object(model_cache, "_moving", set()),
+            mock.patch.object(model_cache, "_watcher_enabled", False),
+            mock.patch.object(model_cache, "_timeout_seconds", 60),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_offload_does_not_hold_lock_and_get_waits(self):
+        model = FakeModel()
+        model_cache.set("tts", model)
+        offloader = threading.Thread(target=model_cache.offload, args=("tts",))
+        offloader.start()
+        self.assertTrue(self.started.wait(5))
+
+        # Taşıma sürerken kilit serbest: health endpoint'inin çağrıları beklemez
+        self.assertTrue(model_cache.has("tts"))
+        self.assertIn("tts", model_cache.get_status())
+
+        got = []
+        getter = threading.Thread(target=lambda: got.append(model_cache.get("tts")))
+        getter.start()
+        getter.join(0.2)
+        self.assertTrue(getter.is_alive())  # Taşıma bitene kadar bekler
+
+        self.release.set()
+        offloader.join(5)
+        getter.join(5)
+        self.assertEqual(got, [model])
+        self.assertEqual(self.moves, ["cpu", "cuda"])
+        self.assertEqual(model.device, "cuda")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+"""
+Kalıcı thread-local bağlantıda transaction geri alma
+"""
+
+import os
+import tempfile
+import unittest
+
+from core import database
+
+
+def _entry(filename: str) -> dict:
+    return {
+        "timestamp": "2024-01-01 00:00",
+        "text": "merhaba",
+        "language": "tr",
+        "seed": 1,
+        "exaggeration": 0.5,
+        "cfg_weight": 0.5,
+        "filename": filename,
+    }
+
+
+class GetConnectionRollbackTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.db_path = database.init_database(tmp.name)
+        self.addCleanup(lambda: database._local.connections.pop(self.db_path).close())
+
+    def _count(self) -> int:
+        with database.get_connection(self.db_path) as conn:
+            return conn.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+
+    def test_non_sqlite_error_rolls_back(self):
+        with self.assertRaises(KeyError):
+            with database.get_connection(self.db_path) as conn:
+                conn.execute(database.INSERT_SQL, database._entry_row(_entry("a.wav")))
+                raise KeyError("filename")
+
+        # Sonraki başarılı commit yarım kalan satırı yazmamalı
+        self.assertTrue(database.add_entry(self.db_path, _entry("b.wav")))
+        self.assertEqual(self._count(), 1)
+
+    def test_partial_list_add_entry_is_not_committed_later(self):
+        broken = _entry("c.wav")
+        del broken["seed"]
+        self.assertFalse(database.add_entry(self.db_path, [_entry("a.wav"), broken]))
+        self.assertTrue(database.add_entry(self.db_path, _entry("b.wav")))
+        self.assertEqual(
+            [e["filename"] for e in database.get_entries(self.db_path)],
+            ["b.wav"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+"""
+.env ayrıştırıcısı (python-dotenv ile aynı sonuçlar)
+"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from core import env
+
+
+class LoadEnvTest(unittest.TestCase):
+    def _load(self, content: str) -> dict:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, ".env")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(content)
+            with mock.patch.dict(os.environ, {}, clear=True), \
+                    mock.patch.object(env, "_env_loaded", False):
+                env.load_env(path)
+                return dict(os.environ)
+
+    def test_values(self):
+        loaded = self._load(
+            "# yorum\n"
+            "PLAIN=value\n"
+            "PLAIN_COMMENT=value # not\n"
+            'DOUBLE="value"\n'
+            'DOUBLE_COMMENT="value" # not\n'
+            "SINGLE_COMMENT='value' # not\n"
+            'HASH_INSIDE="a #b"\n'
+            "export EXPORTED=1\n"
+            "EMPTY=\n"
+        )
+        self.assertEqual(loaded, {
+            "PLAIN": "value",
+            "PLAIN_COMMENT": "value",
+            "DOUBLE": "value",
+            "DOUBLE_COMMENT": "value",
+            "SINGLE_COMMENT": "value",
+            "HASH_INSIDE": "a #b",
+            "EXPORTED": "1",
+            "EMPTY": "",
+        })
+
+    def test_existing_environment_wins(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, ".env")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("PORT=1\n")
+            with mock.patch.dict(os.environ, {"PORT": "2"}, clear=True), \
+                    mock.patch.object(env, "_env_loaded", False):
+                env.load_env(path)
+                self.assertEqual(os.environ["PORT"], "2")
+
+
+if __name__ == "__main__":
+    unittest.main()
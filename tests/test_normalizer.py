@@ -0,0 +1,31 @@
+"""
+normalize_text regresyonları - kurallar çakıştığında baseline çıktısı korunur
+"""
+
+import unittest
+
+from core.normalizer import normalize_text
+
+
+class NormalizeTextOverlapTest(unittest.TestCase):
+    # Kurallar sırayla, bir öncekinin çıktısı üzerinde uygulanır
+    CASES = {
+        "10:30 TL": "on:otuz lira",
+        "£7 TL": "£yedi lira",
+        "3.5": "üçüncü5",
+        "20.00'de": "yirmiinci00'de",
+        "1.5TL": "bir virgül beş lira",
+        "%3.5": "yüzde üç virgül beş",
+        "3,5": "üç virgül beş",
+        "Saat 15:30'da %50 indirim": "Saat on beş otuz'da yüzde elli indirim",
+        "31.12.2024 tarihinde": "otuz bir aralık iki bin yirmi dört tarihinde",
+    }
+
+    def test_overlapping_rules_match_baseline(self):
+        for text, expected in self.CASES.items():
+            with self.subTest(text=text):
+                self.assertEqual(normalize_text(text), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
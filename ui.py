@@ -3,10 +3,8 @@ AutomationX TTS - User Interface (Gradio)
 """
 
 import gradio as gr
-import torch
-import torchaudio as ta
 import os
-import random
+import secrets
 from datetime import datetime
 
 from core import (
@@ -16,7 +14,6 @@ from core import (
     logger,
     ValidationError,
     normalize_text,
-    AudioProcessor,
     LANGUAGES,
     PRESETS,
     PRESET_GROUPS,
@@ -24,6 +21,8 @@ from core import (
 
     split_into_sentences,
     merge_audio_with_crossfade,
+    write_wav,
+    generate_chunks,
 )
 
 # state is singleton
@@ -53,11 +52,8 @@ def generate_speech(text, language, ref_audio, exaggeration, cfg_weight, seed, p
     if not text.strip():
         raise ValidationError("Lutfen bir metin girin!")
     
-    # Seed ayarla
-    actual_seed = int(seed) if seed >= 0 else random.randint(0, 999999)
-    torch.manual_seed(actual_seed)
-    if torch.cuda.is_available():
-        torch.cuda.manual_seed(actual_seed)
+    # Seed ayarla (chunk başına seed'leme generate_chunks içinde, izole RNG ile)
+    actual_seed = int(seed) if seed >= 0 else secrets.randbits(31)
     
     progress(0.1, desc="Model yukleniyor...")
     tts = state.tts_model
@@ -75,61 +71,43 @@ def generate_speech(text, language, ref_audio, exaggeration, cfg_weight, seed, p
     
     logger.info(f"Processing {total_chunks} chunks...")
     
-    audio_segments = []
-    for i, chunk in enumerate(chunks):
-        progress_val = 0.1 + (0.7 * (i / total_chunks))
-        progress(progress_val, desc=f"Ses uretiliyor... ({i+1}/{total_chunks})")
-        
-        chunk_seed = actual_seed + i # Deterministic per chunk but different
-        
-        # Retry logic for stability
-        wav_chunk = None
-        for attempt in range(3):
-            try:
-                # Set seed for this attempt
-                current_seed = chunk_seed + (attempt * 100)
-                torch.manual_seed(current_seed)
-                if torch.cuda.is_available():
-                    torch.cuda.manual_seed(current_seed)
-                
-                wav_chunk = tts.generate(
-                    chunk,
-                    language_id=lang_code,
-                    audio_prompt_path=ref_audio if ref_audio else None,
-                    exaggeration=exaggeration,
-                    cfg_weight=cfg_weight,
-                )
-                break # Success
-            except RuntimeError as e:
-                logger.warning(f"Chunk generation failed (attempt {attempt+1}): {e}")
-                if attempt == 2:
-                     logger.error(f"Skipping chunk after 3 failures: {chunk[:20]}...")
-                     # Create silent chunk of 0.5s as placeholder
-                     wav_chunk = torch.zeros(1, int(tts.sr * 0.5))
-        
-        if wav_chunk is not None:
-             audio_segments.append(wav_chunk)
+    def on_progress(i, total):
+        progress(0.1 + 0.7 * (i / total), desc=f"Ses uretiliyor... ({i+1}/{total})")
+    
+    # Referans ses bir kez islenir; chunk'lar, seed'ler ve tekrar denemeler ortak dongude
+    audio_segments = generate_chunks(
+        tts,
+        chunks,
+        language_id=lang_code,
+        audio_prompt_path=ref_audio if ref_audio else None,
+        exaggeration=exaggeration,
+        cfg_weight=cfg_weight,
+        seed=actual_seed,
+        cache_results=seed >= 0,
+        progress_callback=on_progress,
+        log_prefix="[UI] ",
+        autocast_dtype=state.autocast_dtype,
+    )
     
     progress(0.85, desc="Parcalar birlestiriliyor...")
     if len(audio_segments) > 1:
-        wav = merge_audio_with_crossfade(audio_segments, tts.sr)
+        wav = merge_audio_with_crossfade(audio_segments, tts.sr, release=True)
     else:
         wav = audio_segments[0]
     
     progress(0.88, desc="Ses filtreleniyor...")
-    audio_processor = AudioProcessor(state.audio_config)
-    wav = audio_processor.process(wav, tts.sr)
+    wav = state.audio_processor.process(wav, tts.sr)
     
     progress(0.9, desc="Kaydediliyor...")
-    os.makedirs(state.outputs_dir, exist_ok=True)
-    
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    # outputs klasörü AppState açılışında oluşturulur (init_database)
+    now = datetime.now()
+    timestamp = now.strftime("%Y%m%d_%H%M%S")
     filename = f"tts_{timestamp}.wav"
     filepath = os.path.join(state.outputs_dir, filename)
-    ta.save(filepath, wav, tts.sr)
+    write_wav(filepath, wav, tts.sr)
     
     state.save_to_history({
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M"),
+        "timestamp": now.strftime("%Y-%m-%d %H:%M"),
         "text": text,
         "language": language,
         "seed": actual_seed,